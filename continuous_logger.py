@@ -11,73 +11,848 @@ This script runs indefinitely until cancelled with Ctrl+C or max count is reache
 """
 
 import os
+import re
+import gzip
+import json
+import queue
+import shutil
+import struct
 import sys
 import time
+import asyncio
 import random
 import string
 import signal
+import stat
 import threading
 import argparse
+import math
+from array import array
+from collections import OrderedDict
 from datetime import datetime
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 # Generate a random identifier (8 characters)
 def generate_identifier():
     chars = string.ascii_letters + string.digits
     return ''.join(random.choice(chars) for _ in range(8))
 
+# The formatted date and time of the last second a timestamp was formatted in
+_timestamp_prefix = (None, "")
+
+# Format a time.time_ns() value like "2024-01-31 12:00:00.123". The part up to
+# the seconds is cached, so most lines skip strftime.
+def format_wall_time(wall_ns):
+    global _timestamp_prefix
+    seconds, ns = divmod(wall_ns, 1_000_000_000)
+    cached_second, prefix = _timestamp_prefix
+    if seconds != cached_second:
+        prefix = datetime.fromtimestamp(seconds).strftime("%Y-%m-%d %H:%M:%S")
+        _timestamp_prefix = (seconds, prefix)
+    return f"{prefix}.{ns // 1_000_000:03d}"
+
 # Format the current timestamp
 def get_timestamp():
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    return format_wall_time(time.time_ns())
 
-# Write a message to stdout, stderr, and the log file
-def log_message(message, identifier, log_file):
-    timestamp = get_timestamp()
-    formatted_message = f"[{timestamp}] [{identifier}] {message}"
-    
-    # Write to stdout
-    print(formatted_message, flush=True)
-    
-    # Write to stderr
-    print(formatted_message, file=sys.stderr, flush=True)
-    
-    # Write to log file
-    with open(log_file, 'a') as f:
-        f.write(formatted_message + '\n')
-        f.flush()
+# Log file formats and the suffix of their files
+LOG_FORMATS = {"text": ".log", "jsonl": ".jsonl", "binary": ".clog"}
+
+# Record types, in the order of their binary type codes
+RECORD_TYPES = ("info", "counter", "input", "error", "end")
+
+# Binary record header: length of the rest of the record, monotonic ns,
+# wall clock ns, counter, type code. The UTF-8 message follows.
+RECORD_HEADER = struct.Struct('<IqqqB')
+
+# A log record: (monotonic_ns, wall_ns, identifier, type, counter, message).
+# Times are taken when the record is made, so it can be formatted later.
+def make_record(message, identifier, kind="info", counter=0):
+    return (time.monotonic_ns(), time.time_ns(), identifier, kind, counter, message)
+
+# Format a record as a "[timestamp] [identifier] message" line
+def format_text(record):
+    return f"[{format_wall_time(record[1])}] [{record[2]}] {record[5]}"
+
+# Format a record as a JSON object on one line
+def format_jsonl(record):
+    mono_ns, wall_ns, identifier, kind, counter, message = record
+    return json.dumps({"mono_ns": mono_ns, "wall_ns": wall_ns, "id": identifier,
+                       "type": kind, "counter": counter, "message": message})
+
+# Encode a record as a length-prefixed binary record. The identifier is not
+# stored; it is in the name of the log file.
+def encode_binary(record):
+    mono_ns, wall_ns, _, kind, counter, message = record
+    payload = message.encode()
+    return RECORD_HEADER.pack(RECORD_HEADER.size - 4 + len(payload), mono_ns, wall_ns,
+                              counter, RECORD_TYPES.index(kind)) + payload
+
+# Flush policies for LogSink
+FLUSH_POLICIES = ("line", "count", "time")
+
+# Keeps at most `max_open` log files open, closing the least recently
+# written one when another is needed, so thousands of sessions don't run
+# out of file descriptors. Files are opened in append mode, so a closed file
+# is simply reopened on its next write.
+class FileHandlePool:
+    def __init__(self, max_open=256):
+        self.max_open = max(1, max_open)
+        self.files = OrderedDict()
+
+    def open(self, path, mode='a'):
+        return PooledFile(self, path, mode)
+
+    def _get(self, path, mode):
+        f = self.files.get(path)
+        if f is not None:
+            self.files.move_to_end(path)
+            return f
+        if len(self.files) >= self.max_open:
+            _, oldest = self.files.popitem(last=False)
+            oldest.close()
+        f = self.files[path] = open(path, mode)
+        return f
+
+    def write(self, path, data, mode='a'):
+        self._get(path, mode).write(data)
+
+    def flush(self, path):
+        f = self.files.get(path)
+        if f is not None:
+            f.flush()
+
+    def close(self, path):
+        f = self.files.pop(path, None)
+        if f is not None:
+            f.close()
+
+# Compression formats for rotated log segments, by file suffix
+COMPRESSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+# Parse a size like "500000", "64K", "100M" or "1G" into bytes
+def parse_size(value):
+    match = re.fullmatch(r'(\d+)([KMG]?)B?', value.strip(), re.IGNORECASE)
+    if not match or int(match.group(1)) == 0:
+        raise argparse.ArgumentTypeError(f"invalid size: {value}")
+    return int(match.group(1)) * SIZE_UNITS[match.group(2).upper()]
+
+# When log files are rotated, how rotated segments are compressed and how
+# many are kept. Rotated segments are renamed to <log file>.<n>; a
+# background thread compresses them and removes the oldest ones beyond
+# `keep`, so rotation never waits on compression. One rotation can be
+# shared by many sinks.
+class LogRotation:
+    def __init__(self, max_bytes=0, interval=0, compression="gzip", keep=0):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.compression = compression
+        self.keep = keep
+        self.jobs = queue.Queue()
+        # Segments submitted but not archived yet; pruning leaves them to the worker
+        self.pending = set()
+        self.pending_lock = threading.Lock()
+        self.worker = threading.Thread(target=self._archive_segments, daemon=True)
+        self.worker.start()
+
+    def describe(self):
+        limits = []
+        if self.max_bytes:
+            limits.append(f"{self.max_bytes} bytes")
+        if self.interval:
+            limits.append(f"{self.interval} seconds")
+        kept = f"keeping {self.keep}" if self.keep > 0 else "keeping all"
+        return f"Rotation: every {' or '.join(limits)}, compression {self.compression}, {kept}"
+
+    def submit(self, log_file, segment):
+        with self.pending_lock:
+            self.pending.add(os.path.abspath(segment))
+        self.jobs.put((log_file, segment))
+
+    # Wait for the queued segments to be archived and stop the worker
+    def close(self):
+        self.jobs.put(None)
+        self.worker.join()
+
+    def _archive_segments(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            log_file, segment = job
+            try:
+                self._compress(segment)
+            except OSError as e:
+                print(f"Error archiving {segment}: {e}", file=sys.stderr)
+            with self.pending_lock:
+                self.pending.discard(os.path.abspath(segment))
+            try:
+                self._prune(log_file)
+            except OSError as e:
+                print(f"Error pruning segments of {log_file}: {e}", file=sys.stderr)
+
+    def _compress(self, segment):
+        suffix = COMPRESSIONS[self.compression]
+        if not suffix:
+            return
+        tmp_path = segment + suffix + '.tmp'
+        with open(segment, 'rb') as src:
+            if self.compression == "gzip":
+                with gzip.open(tmp_path, 'wb', compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+            else:
+                with open(tmp_path, 'wb') as dst:
+                    zstandard.ZstdCompressor().copy_stream(src, dst)
+        os.replace(tmp_path, segment + suffix)
+        os.remove(segment)
+
+    # Remove the oldest archived segments of a log file beyond `keep`. Segments
+    # still queued for compression count towards `keep` but are only removed
+    # once they are archived, by the prune that follows their own job.
+    def _prune(self, log_file):
+        if self.keep <= 0:
+            return
+        segments = sorted(rotated_segments(log_file))
+        with self.pending_lock:
+            pending = set(self.pending)
+        for _, path in segments[:-self.keep]:
+            if path not in pending:
+                os.remove(path)
+
+# List (number, path) for the rotated segments of a log file, compressed or not
+def rotated_segments(log_file):
+    directory, name = os.path.split(os.path.abspath(log_file))
+    pattern = re.compile(re.escape(name) + r'\.(\d+)(\.gz|\.zst)?')
+    segments = []
+    for entry in os.scandir(directory):
+        match = pattern.fullmatch(entry.name)
+        if match:
+            segments.append((int(match.group(1)), entry.path))
+    return segments
+
+# A log file that is rotated once it reaches `rotation.max_bytes` or has been
+# written for `rotation.interval` seconds. Rotating only closes, renames and
+# reopens the file; compression happens on the rotation's worker thread.
+# `opener` opens the live file (plain open() or a FileHandlePool).
+class RotatingLogFile:
+    def __init__(self, path, rotation, opener=None, mode='a'):
+        self.path = path
+        self.rotation = rotation
+        self.opener = opener or open
+        self.mode = mode
+        self.file = self.opener(path, mode)
+        self.size = os.path.getsize(path)
+        self.opened_at = time.monotonic()
+        self.next_segment = max((number for number, _ in rotated_segments(path)), default=0) + 1
+
+    def write(self, data):
+        if self.size > 0 and self._due():
+            self.rotate()
+        self.file.write(data)
+        self.size += len(data) if isinstance(data, bytes) or data.isascii() else len(data.encode())
+
+    def _due(self):
+        rotation = self.rotation
+        return ((rotation.max_bytes and self.size >= rotation.max_bytes) or
+                (rotation.interval and time.monotonic() - self.opened_at >= rotation.interval))
+
+    def rotate(self):
+        self.file.close()
+        segment = f"{self.path}.{self.next_segment}"
+        self.next_segment += 1
+        os.rename(self.path, segment)
+        self.file = self.opener(self.path, self.mode)
+        self.size = 0
+        self.opened_at = time.monotonic()
+        self.rotation.submit(self.path, segment)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+# A file-like handle to one path in a FileHandlePool
+class PooledFile:
+    def __init__(self, pool, path, mode='a'):
+        self.pool = pool
+        self.path = path
+        self.mode = mode
+        open(path, mode).close()  # Create it now, like open() would
+
+    def write(self, data):
+        self.pool.write(self.path, data, self.mode)
+
+    def flush(self):
+        self.pool.flush(self.path)
+
+    def close(self):
+        self.pool.close(self.path)
+
+# Writes log records to stdout, stderr and a log file that stays open for the
+# whole session. stdout and stderr get text lines; the log file gets
+# `log_format` (see LOG_FORMATS). Each destination can be turned off, and the flush policy
+# decides how often buffered output is pushed out:
+# - "line": after every line (the original behaviour)
+# - "count": after every `flush_every` lines
+# - "time": from a background thread every `flush_ms` milliseconds, unless
+#   `flush_thread` is False and the owner calls flush() itself
+# The sink is shared by the main loop and the stdin reader thread. With a
+# `file_pool` the log file is written through the pool instead of being
+# held open, and with a `rotation` it is rotated (see LogRotation).
+class LogSink:
+    def __init__(self, log_file, to_stdout=True, to_stderr=True, to_file=True,
+                 flush_policy="line", flush_every=100, flush_ms=1000,
+                 flush_thread=True, file_pool=None, rotation=None, log_format="text"):
+        if flush_policy not in FLUSH_POLICIES:
+            raise ValueError(f"Unknown flush policy: {flush_policy}")
+        if log_format not in LOG_FORMATS:
+            raise ValueError(f"Unknown log format: {log_format}")
+        self.log_file = log_file
+        self.log_format = log_format
+        self.flush_policy = flush_policy
+        self.flush_every = max(1, flush_every)
+        self.flush_ms = flush_ms
+        self.streams = []
+        if to_stdout:
+            self.streams.append(sys.stdout)
+        if to_stderr:
+            self.streams.append(sys.stderr)
+        self.console = list(self.streams)
+        opener = file_pool.open if file_pool is not None else open
+        mode = 'ab' if log_format == "binary" else 'a'
+        if not to_file:
+            self.file = None
+        elif rotation is not None:
+            self.file = RotatingLogFile(log_file, rotation, opener, mode)
+        else:
+            self.file = opener(log_file, mode)
+        if self.file is not None:
+            self.streams.append(self.file)
+        # Re-entrant so the SIGINT handler can log while the main thread is mid-write
+        self.lock = threading.RLock()
+        self.unflushed = 0
+        self.closed = threading.Event()
+        self.flusher = None
+        if flush_policy == "time" and flush_thread:
+            self.flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+            self.flusher.start()
+
+    def write(self, record):
+        self.write_records([record])
+
+    # Write several records with one write per stream. Records are only
+    # formatted in the formats some stream needs.
+    def write_records(self, records):
+        with self.lock:
+            if self.closed.is_set() or not records:
+                return
+            text = None
+            if self.console or (self.file is not None and self.log_format == "text"):
+                text = '\n'.join(map(format_text, records)) + '\n'
+                for stream in self.console:
+                    stream.write(text)
+            if self.file is not None:
+                if self.log_format == "text":
+                    self.file.write(text)
+                elif self.log_format == "jsonl":
+                    self.file.write('\n'.join(map(format_jsonl, records)) + '\n')
+                else:
+                    self.file.write(b''.join(map(encode_binary, records)))
+            self.unflushed += len(records)
+            if self.flush_policy == "line" or (
+                    self.flush_policy == "count" and self.unflushed >= self.flush_every):
+                self._flush_locked()
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        for stream in self.streams:
+            stream.flush()
+        self.unflushed = 0
+
+    def _flush_periodically(self):
+        while not self.closed.wait(self.flush_ms / 1000):
+            self.flush()
+
+    def close(self):
+        with self.lock:
+            if self.closed.is_set():
+                return
+            self._flush_locked()
+            self.closed.set()
+            if self.file is not None:
+                self.file.close()
+
+# Write a message to the sink (stdout, stderr, and the log file)
+def log_message(message, identifier, sink, kind="info", counter=0):
+    sink.write(make_record(message, identifier, kind, counter))
 
 # Function to read from stdin
-def stdin_reader(identifier, log_file, running):
+def stdin_reader(identifier, sink, running):
     while running.is_set():
         try:
-            line = sys.stdin.readline().strip()
+            line = sys.stdin.readline()
+            if not line:
+                break  # stdin was closed
+            line = line.strip()
             if line and running.is_set():
-                log_message(f"INPUT: {line}", identifier, log_file)
+                log_message(f"INPUT: {line}", identifier, sink, "input")
         except KeyboardInterrupt:
             break
         except Exception as e:
             if running.is_set():
-                log_message(f"Error reading stdin: {e}", identifier, log_file)
+                log_message(f"Error reading stdin: {e}", identifier, sink, "error")
+
+# Parse a burst pattern like "50,0,0,0": the number of lines written on
+# each tick, cycled (here 50 lines every fourth tick)
+def parse_burst_pattern(value):
+    try:
+        pattern = [int(part) for part in value.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid burst pattern: {value}")
+    if not pattern or min(pattern) < 0 or sum(pattern) == 0:
+        raise argparse.ArgumentTypeError(f"invalid burst pattern: {value}")
+    return pattern
+
+# Tick lateness histogram: buckets grow by LATENESS_GROWTH from LATENESS_MIN
+# seconds, so percentiles are within 2% from 1 us to over two hours
+LATENESS_MIN = 1e-6
+LATENESS_GROWTH = 1.02
+LATENESS_BUCKETS = 1200
+
+# Counts what a load run achieved and how late each tick started. Lateness
+# is kept as running moments and a fixed-size log-bucket histogram, so the
+# stats of an indefinite run take constant memory.
+class LoadStats:
+    def __init__(self, name="Load"):
+        self.name = name
+        self.lines = 0
+        self.bytes = 0
+        self.ticks = 0
+        self.start = None
+        self.end = None
+        self.late_count = 0
+        self.late_mean = 0.0
+        self.late_m2 = 0.0  # Sum of squared deviations from the mean (Welford)
+        self.late_max = 0.0
+        self.late_buckets = array('q', bytes(8 * LATENESS_BUCKETS))
+
+    # Record the seconds between a tick's deadline and its start
+    def add_lateness(self, seconds):
+        self.late_count += 1
+        delta = seconds - self.late_mean
+        self.late_mean += delta / self.late_count
+        self.late_m2 += delta * (seconds - self.late_mean)
+        self.late_max = max(self.late_max, seconds)
+        bucket = 0
+        if seconds > LATENESS_MIN:
+            bucket = min(LATENESS_BUCKETS - 1, 1 + int(math.log(seconds / LATENESS_MIN, LATENESS_GROWTH)))
+        self.late_buckets[bucket] += 1
+
+    # The lateness below which a `fraction` of the ticks started: the upper
+    # bound of that histogram bucket, capped at the largest lateness seen
+    def late_percentile(self, fraction):
+        rank = min(self.late_count - 1, int(self.late_count * fraction))
+        seen = 0
+        for bucket, count in enumerate(self.late_buckets):
+            seen += count
+            if seen > rank:
+                return min(self.late_max, LATENESS_MIN * LATENESS_GROWTH ** bucket)
+        return self.late_max
+
+    def summary(self):
+        elapsed = (self.end or time.monotonic()) - self.start if self.start is not None else 0.0
+        lines = [f"{self.name} summary: {self.lines} lines, {self.bytes} message bytes in {elapsed:.3f} s"]
+        if elapsed > 0:
+            lines.append(f"Throughput: {self.lines / elapsed:.1f} lines/s, "
+                         f"{self.bytes / elapsed / 1024:.1f} KiB/s")
+        if self.late_count:
+            stdev = (self.late_m2 / self.late_count) ** 0.5
+            p50 = self.late_percentile(0.5)
+            p99 = self.late_percentile(0.99)
+            lines.append(f"Tick jitter over {self.ticks} ticks: mean {self.late_mean * 1000:.3f} ms, "
+                         f"stdev {stdev * 1000:.3f} ms, p50 {p50 * 1000:.3f} ms, "
+                         f"p99 {p99 * 1000:.3f} ms, max {self.late_max * 1000:.3f} ms")
+        return lines
+
+# Write lines as fast as the target rate asks. Tick k is scheduled at
+# start + k * period on the monotonic clock, so a slow tick is caught up
+# instead of pushing every later tick back (no drift).
+def run_load(args, identifier, sink, running, stats):
+    pattern = args.burst
+    if args.rate:
+        # Spread the pattern's average lines per tick over the target rate
+        period = (sum(pattern) / len(pattern)) / args.rate
+    else:
+        period = args.interval
+    payload = 'x' * args.payload_size
+
+    stats.start = time.monotonic()
+    deadline_end = stats.start + args.duration if args.duration > 0 else None
+    tick = 0
+    while running.is_set():
+        deadline = stats.start + tick * period
+        now = time.monotonic()
+        if deadline > now:
+            time.sleep(deadline - now)
+            now = time.monotonic()
+        if deadline_end is not None and now >= deadline_end:
+            break
+        stats.add_lateness(now - deadline)
+        stats.ticks += 1
+
+        for _ in range(pattern[tick % len(pattern)]):
+            stats.lines += 1
+            message = f"Counter: {stats.lines} {payload}" if payload else f"Counter: {stats.lines}"
+            log_message(message, identifier, sink, "counter", stats.lines)
+            stats.bytes += len(message)
+            if args.max_count > 0 and stats.lines >= args.max_count:
+                running.clear()
+                break
+        tick += 1
+    stats.end = time.monotonic()
+    sink.flush()
+
+# Queue of log records written by one task on the event loop. Records are
+# timestamped when they are queued and formatted and written in batches, so
+# sessions never block on output. Each batch is written with one write per
+# sink, and in order to the shared `console` sink if there is one.
+class AsyncLogWriter:
+    def __init__(self, batch_size=1024, console=None):
+        self.queue = asyncio.Queue()
+        self.batch_size = batch_size
+        self.console = console
+
+    def log(self, sink, message, identifier, kind="info", counter=0):
+        self.queue.put_nowait((sink, make_record(message, identifier, kind, counter)))
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            by_sink = {}
+            for sink, record in batch:
+                by_sink.setdefault(sink, []).append(record)
+            for sink, records in by_sink.items():
+                sink.write_records(records)
+            if self.console is not None:
+                self.console.write_records([record for _, record in batch])
+            for _ in batch:
+                self.queue.task_done()
+
+# One logger session (identifier, counter and sink) run as a task on the
+# event loop. Many sessions can share one loop and one AsyncLogWriter, and
+# one LoadStats that counts their counter lines and tick lateness.
+class AsyncLoggerSession:
+    def __init__(self, identifier, sink, interval, max_count=0, stats=None):
+        self.identifier = identifier
+        self.sink = sink
+        self.interval = interval
+        self.max_count = max_count
+        self.stats = stats
+        self.counter = 0
+        self.writer = None
+
+    def log(self, message, kind="info", counter=0):
+        self.writer.log(self.sink, message, self.identifier, kind, counter)
+
+    # Tick on a drift-free schedule until max_count is reached or the task is cancelled
+    async def run(self, writer):
+        self.writer = writer
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        while True:
+            deadline = start + (self.counter + 1) * self.interval
+            await asyncio.sleep(deadline - loop.time())
+            self.counter += 1
+            message = f"Counter: {self.counter}"
+            self.log(message, "counter", self.counter)
+            if self.stats is not None:
+                self.stats.add_lateness(loop.time() - deadline)
+                self.stats.ticks += 1
+                self.stats.lines += 1
+                self.stats.bytes += len(message)
+            if self.max_count > 0 and self.counter >= self.max_count:
+                self.log(f"Reached maximum count of {self.max_count}, shutting down...")
+                return
+
+# Read stdin without blocking the event loop and pass each line to on_line
+async def read_stdin_lines(on_line):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=1 << 20)
+    try:
+        mode = os.fstat(sys.stdin.fileno()).st_mode
+        watchable = stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode) or sys.stdin.isatty()
+    except (OSError, ValueError, AttributeError):
+        watchable = False
+    if watchable:
+        # Watch a duplicate so closing the transport doesn't close sys.stdin
+        pipe = os.fdopen(os.dup(sys.stdin.fileno()), 'rb', buffering=0)
+        transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+    else:
+        # Files and devices like /dev/null can't be watched by the loop; they never block for long, so read them in a worker thread
+        while True:
+            line = await loop.run_in_executor(None, sys.stdin.readline)
+            if not line:
+                return
+            on_line(line)
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            on_line(line.decode(errors='replace'))
+    finally:
+        transport.close()
+
+# Flush sinks with the "time" policy that have no flusher thread of their own
+async def flush_periodically(sinks):
+    interval = min(sink.flush_ms for sink in sinks) / 1000
+    while True:
+        await asyncio.sleep(interval)
+        for sink in sinks:
+            sink.flush()
+
+# Run sessions on the current event loop until all reach max_count or
+# SIGINT arrives, then log the shutdown, drain the queue and close the
+# session sinks. Stdin lines are logged by every session. Every line is
+# also written to `console` if given; the caller closes it.
+async def run_async_sessions(sessions, read_stdin=True, console=None):
+    loop = asyncio.get_running_loop()
+    writer = AsyncLogWriter(console=console)
+    done = asyncio.Event()
+    interrupted = False
+    remaining = len(sessions)
+
+    def on_sigint():
+        nonlocal interrupted
+        interrupted = True
+        done.set()
+
+    def on_session_done(task):
+        nonlocal remaining
+        remaining -= 1
+        if remaining == 0:
+            done.set()
+
+    def on_line(line):
+        line = line.strip()
+        if line:
+            for session in sessions:
+                session.log(f"INPUT: {line}", "input")
+
+    try:
+        loop.add_signal_handler(signal.SIGINT, on_sigint)
+    except (NotImplementedError, RuntimeError):
+        pass  # No loop signal handlers here; Ctrl+C raises KeyboardInterrupt instead
+
+    stdin_fd = stdin_blocking = None
+    if read_stdin:
+        try:
+            stdin_fd = sys.stdin.fileno()
+            stdin_blocking = os.get_blocking(stdin_fd)
+        except (OSError, ValueError, AttributeError):
+            stdin_fd = None
+
+    writer_task = asyncio.create_task(writer.run())
+    background = [asyncio.create_task(read_stdin_lines(on_line))] if read_stdin else []
+    timed = [sink for sink in [session.sink for session in sessions] + [console]
+             if sink is not None and sink.flush_policy == "time" and sink.flusher is None]
+    if timed:
+        background.append(asyncio.create_task(flush_periodically(timed)))
+    session_tasks = []
+    for session in sessions:
+        task = asyncio.create_task(session.run(writer))
+        task.add_done_callback(on_session_done)
+        session_tasks.append(task)
+    if not sessions:
+        done.set()
+
+    try:
+        await done.wait()
+    finally:
+        for task in session_tasks + background:
+            task.cancel()
+        await asyncio.gather(*session_tasks, *background, return_exceptions=True)
+        if stdin_fd is not None:
+            # connect_read_pipe makes stdin non-blocking; don't leave it that way for the shell
+            try:
+                os.set_blocking(stdin_fd, stdin_blocking)
+            except OSError:
+                pass
+
+        for session in sessions:
+            if interrupted:
+                session.log("Received SIGINT, shutting down...")
+            session.log("END", "end")
+        await writer.queue.join()
+        writer_task.cancel()
+        await asyncio.gather(writer_task, return_exceptions=True)
+        for session in sessions:
+            session.sink.close()
+
+# Run args.sessions logger sessions on one event loop. Each session has its
+# own identifier, counter and log file; log files are written through a
+# FileHandlePool, and stdout/stderr output goes through one shared sink.
+def run_fan_out(args, rotation=None):
+    run_id = generate_identifier()
+    console = LogSink(None, to_stdout=not args.no_stdout, to_stderr=not args.no_stderr,
+                      to_file=False, flush_policy=args.flush, flush_every=args.flush_every,
+                      flush_ms=args.flush_ms, flush_thread=False)
+    pool = FileHandlePool(args.max_open_files)
+    stats = LoadStats("Sessions")
+
+    log_message(f"STARTING continuous logger with {args.sessions} sessions, run ID: {run_id}", run_id, console)
+    suffix = LOG_FORMATS[args.format]
+    log_message(f"Log files: {os.path.abspath(os.path.join(args.log_dir, 'continuous_log_<ID>' + suffix))}",
+                run_id, console)
+    log_message(f"Interval: {args.interval} seconds, at most {pool.max_open} log files open",
+                run_id, console)
+    if rotation is not None:
+        log_message(rotation.describe(), run_id, console)
+
+    sessions = []
+    identifiers = set()
+    while len(sessions) < args.sessions:
+        identifier = generate_identifier()
+        if identifier in identifiers:
+            continue
+        identifiers.add(identifier)
+        log_file = os.path.join(args.log_dir, f"continuous_log_{identifier}{suffix}")
+        sink = LogSink(log_file, to_stdout=False, to_stderr=False, to_file=not args.no_file,
+                       flush_policy=args.flush, flush_every=args.flush_every,
+                       flush_ms=args.flush_ms, flush_thread=False, file_pool=pool,
+                       rotation=rotation, log_format=args.format)
+        log_message(f"STARTING continuous logger with ID: {identifier}", identifier, sink)
+        log_message(f"Log file: {os.path.abspath(log_file)}", identifier, sink)
+        log_message(f"Interval: {args.interval} seconds", identifier, sink)
+        if args.max_count > 0:
+            log_message(f"Will stop after {args.max_count} iterations", identifier, sink)
+        else:
+            log_message("Will run indefinitely until cancelled with Ctrl+C", identifier, sink)
+        sessions.append(AsyncLoggerSession(identifier, sink, args.interval, args.max_count, stats))
+
+    stats.start = time.monotonic()
+    try:
+        asyncio.run(run_async_sessions(sessions, console=console))
+    finally:
+        stats.end = time.monotonic()
+        summary = stats.summary()
+        summary.append(f"Sessions: {len(sessions)}, "
+                       f"counters {min(s.counter for s in sessions)}-{max(s.counter for s in sessions)}")
+        for line in summary:
+            if console.console:
+                log_message(line, run_id, console)
+            else:
+                print(line)
+        log_message("END", run_id, console, "end")
+        console.close()
 
 # Main function
 def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Continuous logger for OpenHands testing')
-    parser.add_argument('--interval', type=int, default=10,
+    parser.add_argument('--interval', type=float, default=10,
                         help='Interval between counter increments in seconds (default: 10)')
     parser.add_argument('--max-count', type=int, default=0,
                         help='Maximum counter value before exiting (default: 0, run indefinitely)')
     parser.add_argument('--log-dir', type=str, default='.',
                         help='Directory to store log files (default: current directory)')
+    parser.add_argument('--flush', choices=FLUSH_POLICIES, default='line',
+                        help='When to flush output: every line, every --flush-every lines, '
+                             'or every --flush-ms milliseconds (default: line)')
+    parser.add_argument('--flush-every', type=int, default=100,
+                        help='Lines between flushes with --flush count (default: 100)')
+    parser.add_argument('--flush-ms', type=int, default=1000,
+                        help='Milliseconds between flushes with --flush time (default: 1000)')
+    parser.add_argument('--no-stdout', action='store_true', help='Do not write to stdout')
+    parser.add_argument('--no-stderr', action='store_true', help='Do not write to stderr')
+    parser.add_argument('--no-file', action='store_true', help='Do not write the log file')
+    parser.add_argument('--format', choices=tuple(LOG_FORMATS), default='text',
+                        help='Log file format: text lines, JSON Lines, or length-prefixed binary '
+                             'records read with log_reader.py; stdout and stderr always get text '
+                             '(default: text)')
+    parser.add_argument('--engine', choices=('thread', 'asyncio'), default='thread',
+                        help='Run with a sleep loop and a stdin thread, or with one asyncio event loop '
+                             '(default: thread)')
+    parser.add_argument('--sessions', type=int, default=1,
+                        help='Run this many sessions, each with its own ID, counter and log file, '
+                             'on one asyncio event loop (default: 1)')
+    parser.add_argument('--max-open-files', type=int, default=256,
+                        help='Log files kept open at once with --sessions (default: 256)')
+    rotate = parser.add_argument_group('log rotation')
+    rotate.add_argument('--rotate-size', type=parse_size, default=0,
+                        help='Rotate the log file once it reaches this size, e.g. 100M (default: no limit)')
+    rotate.add_argument('--rotate-interval', type=float, default=0,
+                        help='Rotate the log file after this many seconds (default: no limit)')
+    rotate.add_argument('--compress', choices=tuple(COMPRESSIONS), default='gzip',
+                        help='Compression of rotated segments, done in the background (default: gzip)')
+    rotate.add_argument('--keep', type=int, default=0,
+                        help='Rotated segments to keep per log file; older ones are deleted '
+                             '(default: 0, keep all)')
+    load = parser.add_argument_group('load generation')
+    load.add_argument('--load', action='store_true',
+                      help='Write lines on a drift-free schedule and report throughput and jitter')
+    load.add_argument('--rate', type=float, default=0,
+                      help='Target lines per second; sets the tick period (default: use --interval)')
+    load.add_argument('--burst', type=parse_burst_pattern, default=[1],
+                      help='Lines written per tick, as a comma-separated pattern that repeats, '
+                           'e.g. 50,0,0,0 (default: 1)')
+    load.add_argument('--payload-size', type=int, default=0,
+                      help='Bytes of padding appended to every counter line (default: 0)')
+    load.add_argument('--duration', type=float, default=0,
+                      help='Stop after this many seconds (default: 0, no limit)')
     args = parser.parse_args()
+    if args.engine == 'asyncio' and args.load:
+        parser.error('--load is only supported by the thread engine')
+    if args.sessions < 1:
+        parser.error('--sessions must be at least 1')
+    if args.sessions > 1 and args.load:
+        parser.error('--load is only supported with a single session')
+    if args.compress == 'zstd' and zstandard is None:
+        parser.error('--compress zstd needs the zstandard package')
+
+    rotation = None
+    if args.rotate_size or args.rotate_interval:
+        rotation = LogRotation(args.rotate_size, args.rotate_interval, args.compress, args.keep)
+    try:
+        run(args, rotation)
+    finally:
+        if rotation is not None:
+            rotation.close()  # Finish compressing what was rotated
+
+# Run the logger with the parsed arguments
+def run(args, rotation=None):
+    # Create log directory if it doesn't exist
+    os.makedirs(args.log_dir, exist_ok=True)
+
+    if args.sessions > 1:
+        run_fan_out(args, rotation)
+        return
     
     # Generate random identifier
     identifier = generate_identifier()
     
-    # Create log directory if it doesn't exist
-    os.makedirs(args.log_dir, exist_ok=True)
-    
     # Create log file with identifier in the name
-    log_file = os.path.join(args.log_dir, f"continuous_log_{identifier}.log")
+    log_file = os.path.join(args.log_dir, f"continuous_log_{identifier}{LOG_FORMATS[args.format]}")
+    sink = LogSink(log_file, to_stdout=not args.no_stdout, to_stderr=not args.no_stderr,
+                   to_file=not args.no_file, flush_policy=args.flush,
+                   flush_every=args.flush_every, flush_ms=args.flush_ms, rotation=rotation,
+                   log_format=args.format)
     
     # Initialize counter
     counter = 0
@@ -87,47 +862,69 @@ def main():
     running.set()
     
     # Log start message
-    log_message(f"STARTING continuous logger with ID: {identifier}", identifier, log_file)
-    log_message(f"Log file: {os.path.abspath(log_file)}", identifier, log_file)
-    log_message(f"Interval: {args.interval} seconds", identifier, log_file)
+    log_message(f"STARTING continuous logger with ID: {identifier}", identifier, sink)
+    log_message(f"Log file: {os.path.abspath(log_file)}", identifier, sink)
+    if args.load and args.rate:
+        # The expected gap between counter lines, which log_analyzer checks the lines against
+        log_message(f"Interval: {1 / args.rate:.9f} seconds", identifier, sink)
+    else:
+        log_message(f"Interval: {args.interval} seconds", identifier, sink)
+    if rotation is not None:
+        log_message(rotation.describe(), identifier, sink)
+    if args.load:
+        rate = f"{args.rate} lines/s" if args.rate else f"one tick every {args.interval} s"
+        log_message(f"Load mode: {rate}, burst {','.join(map(str, args.burst))}, "
+                    f"payload {args.payload_size} bytes", identifier, sink)
     if args.max_count > 0:
-        log_message(f"Will stop after {args.max_count} iterations", identifier, log_file)
+        log_message(f"Will stop after {args.max_count} iterations", identifier, sink)
     else:
-        log_message("Will run indefinitely until cancelled with Ctrl+C", identifier, log_file)
+        log_message("Will run indefinitely until cancelled with Ctrl+C", identifier, sink)
+
+    if args.engine == 'asyncio':
+        session = AsyncLoggerSession(identifier, sink, args.interval, args.max_count)
+        asyncio.run(run_async_sessions([session]))
+        return
     
     # Start stdin reader thread
-    stdin_thread = threading.Thread(target=stdin_reader, args=(identifier, log_file, running), daemon=True)
+    stdin_thread = threading.Thread(target=stdin_reader, args=(identifier, sink, running), daemon=True)
     stdin_thread.start()
     
-    # Handle SIGINT (Ctrl+C)
+    # Handle SIGINT (Ctrl+C); the main loop's cleanup logs the load summary and END
     def signal_handler(sig, frame):
         running.clear()
-        log_message("Received SIGINT, shutting down...", identifier, log_file)
-        log_message("END", identifier, log_file)
+        log_message("Received SIGINT, shutting down...", identifier, sink)
         sys.exit(0)
     
     signal.signal(signal.SIGINT, signal_handler)
     
+    stats = LoadStats() if args.load else None
+
     # Main loop
     try:
-        while running.is_set():
+        if stats is not None:
+            run_load(args, identifier, sink, running, stats)
+        while running.is_set() and stats is None:
             time.sleep(args.interval)
             counter += 1
-            log_message(f"Counter: {counter}", identifier, log_file)
+            log_message(f"Counter: {counter}", identifier, sink, "counter", counter)
             
             # Check if we've reached max_count
             if args.max_count > 0 and counter >= args.max_count:
-                log_message(f"Reached maximum count of {args.max_count}, shutting down...", identifier, log_file)
+                log_message(f"Reached maximum count of {args.max_count}, shutting down...", identifier, sink)
                 running.clear()
                 break
     except KeyboardInterrupt:
         running.clear()
-        log_message("Interrupted by user", identifier, log_file)
+        log_message("Interrupted by user", identifier, sink)
     except Exception as e:
         running.clear()
-        log_message(f"Error in main loop: {e}", identifier, log_file)
+        log_message(f"Error in main loop: {e}", identifier, sink, "error")
     finally:
-        log_message("END", identifier, log_file)
+        if stats is not None:
+            for line in stats.summary():
+                log_message(line, identifier, sink)
+        log_message("END", identifier, sink, "end")
+        sink.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
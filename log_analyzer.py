@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Log Analyzer for continuous_logger
+
+Measures how well log output was delivered, from the log files written by
+continuous_logger.py in any format (see log_reader.py).
+- Inter-tick interval distribution, per session and over all sessions
+- Missed ticks (gaps in the counter) and late ticks (intervals well over the
+  configured interval)
+- Stdin-to-log latency of INPUT lines whose text starts with the time they
+  were sent, e.g. echo "$(date +%s.%N) hello"
+- Per-session line counts and throughput
+
+Files are memory-mapped and scanned in chunks with a regular expression (text)
+or struct (binary), so multi-GB logs never have to fit in memory.
+"""
+
+import os
+import re
+import sys
+import json
+import glob
+import argparse
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+from continuous_logger import RECORD_TYPES
+from log_reader import (CHUNK_SIZE, identifier_of, log_format_of, iter_binary_spans, iter_jsonl_records,
+                        iter_line_chunks)
+
+# The text log lines the analyzer looks at: counter ticks, stdin input and the
+# configured interval from the session header
+TEXT_LINE = re.compile(
+    rb'^\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\.(\d{3})\] \[([^\]\n]*)\] '
+    rb'(?:Counter: (\d+)|INPUT: ([^\n]*)|Interval: ([\d.]+) seconds)', re.MULTILINE)
+
+# A send time at the start of an INPUT line: epoch seconds or nanoseconds
+SEND_TIME = re.compile(r'(\d{10}(?:\.\d+)?|\d{19})\b')
+
+# Buckets of the interval / configured interval histogram
+RATIO_BUCKETS = (0.5, 0.9, 1.1, 1.5, 2.0, 5.0)
+
+# Rotated segment number of a log file; the live file sorts last
+SEGMENT = re.compile(r'\.(\d+)(?:\.gz|\.zst)?$')
+
+NS_PER_SECOND = 1_000_000_000
+
+# Counts and intervals of one logger session, over all its log files
+class SessionStats:
+    def __init__(self, identifier):
+        self.identifier = identifier
+        self.files = 0
+        self.bytes = 0
+        self.lines = 0
+        self.ticks = 0
+        self.missed = 0
+        self.repeated = 0  # Counters that did not increase
+        self.interval_ns = None  # Configured interval, from the session header
+        self.clock = "wall"
+        self.first_ns = None
+        self.last_ns = None
+        self.last_counter = None
+        self.last_tick_ns = None
+        self.intervals = array('q')
+        self.input_lines = 0
+        self.input_latencies = array('q')
+
+    def add_time(self, t_ns):
+        if self.first_ns is None or t_ns < self.first_ns:
+            self.first_ns = t_ns
+        if self.last_ns is None or t_ns > self.last_ns:
+            self.last_ns = t_ns
+
+    def add_tick(self, counter, t_ns):
+        self.ticks += 1
+        if self.last_counter is not None:
+            if counter <= self.last_counter:
+                self.repeated += 1
+                return
+            self.missed += counter - self.last_counter - 1
+            self.intervals.append(t_ns - self.last_tick_ns)
+        self.last_counter = counter
+        self.last_tick_ns = t_ns
+
+    def add_input(self, text, wall_ns):
+        self.input_lines += 1
+        sent_ns = parse_send_time(text)
+        if sent_ns is not None:
+            self.input_latencies.append(wall_ns - sent_ns)
+
+    def expected_interval_ns(self):
+        if self.interval_ns:
+            return self.interval_ns
+        if self.intervals:
+            return sorted(self.intervals)[len(self.intervals) // 2]
+        return None
+
+    def late_ticks(self, threshold):
+        expected = self.expected_interval_ns()
+        if not expected:
+            return 0
+        limit = expected * (1 + threshold)
+        return sum(1 for interval in self.intervals if interval > limit)
+
+    def duration_s(self):
+        if self.first_ns is None:
+            return 0.0
+        return (self.last_ns - self.first_ns) / NS_PER_SECOND
+
+# Parse the send time at the start of an INPUT line into epoch nanoseconds
+def parse_send_time(text):
+    match = SEND_TIME.match(text.strip())
+    if not match:
+        return None
+    value = match.group(1)
+    if '.' in value or len(value) == 10:
+        seconds, _, fraction = value.partition('.')
+        return int(seconds) * NS_PER_SECOND + int((fraction + '000000000')[:9])
+    return int(value)
+
+# Sort key putting the rotated segments of a log file in order, live file last
+def segment_order(path):
+    match = SEGMENT.search(path)
+    return (identifier_of(path), int(match.group(1)) if match else float('inf'), path)
+
+# Scan a text log in chunks that end on a line boundary
+def scan_text(path, stats_of, chunk_size=CHUNK_SIZE):
+    seconds_of = {}
+    file_identifier = identifier_of(path)
+    for chunk in iter_line_chunks(path, chunk_size):
+        stats = stats_of(file_identifier)
+        stats.lines += chunk.count(b'\n')
+        for match in TEXT_LINE.finditer(chunk):
+            second, millis, identifier, counter, input_text, interval = match.groups()
+            if not file_identifier:
+                stats = stats_of(identifier.decode(errors='replace'))
+            seconds = seconds_of.get(second)
+            if seconds is None:
+                seconds = seconds_of[second] = int(datetime.strptime(
+                    second.decode(), "%Y-%m-%d %H:%M:%S").timestamp())
+            t_ns = (seconds * 1000 + int(millis)) * 1_000_000
+            stats.add_time(t_ns)
+            if counter is not None:
+                stats.add_tick(int(counter), t_ns)
+            elif input_text is not None:
+                stats.add_input(input_text.decode(errors='replace'), t_ns)
+            elif stats.interval_ns is None:
+                stats.interval_ns = int(float(interval) * NS_PER_SECOND)
+
+# Scan a binary log record by record; only INPUT and header messages are decoded
+def scan_binary(path, stats_of):
+    stats = stats_of(identifier_of(path))
+    stats.clock = "monotonic"
+    counter_type = RECORD_TYPES.index("counter")
+    input_type = RECORD_TYPES.index("input")
+    info_type = RECORD_TYPES.index("info")
+    for (length, mono_ns, wall_ns, counter, type_code), buffer, start, end in iter_binary_spans(path):
+        stats.lines += 1
+        stats.add_time(mono_ns)
+        if type_code == counter_type:
+            stats.add_tick(counter, mono_ns)
+        elif type_code == input_type:
+            message = buffer[start:end].decode(errors='replace')
+            stats.add_input(message[len("INPUT: "):], wall_ns)
+        elif type_code == info_type and stats.interval_ns is None:
+            set_interval(stats, buffer[start:end].decode(errors='replace'))
+
+# Scan a JSON Lines log
+def scan_jsonl(path, stats_of):
+    for mono_ns, wall_ns, identifier, kind, counter, message in iter_jsonl_records(path):
+        stats = stats_of(identifier)
+        stats.clock = "monotonic"
+        stats.lines += 1
+        stats.add_time(mono_ns)
+        if kind == "counter":
+            stats.add_tick(counter, mono_ns)
+        elif kind == "input":
+            stats.add_input(message[len("INPUT: "):], wall_ns)
+        elif kind == "info" and stats.interval_ns is None:
+            set_interval(stats, message)
+
+def set_interval(stats, message):
+    if message.startswith("Interval: "):
+        stats.interval_ns = int(float(message.split()[1].rstrip(',')) * NS_PER_SECOND)
+
+# Analyze log files and return the SessionStats of every session, by identifier
+def analyze(paths, interval=None):
+    sessions = {}
+
+    def stats_of(identifier):
+        stats = sessions.get(identifier)
+        if stats is None:
+            stats = sessions[identifier] = SessionStats(identifier)
+        return stats
+
+    scanners = {"text": scan_text, "binary": scan_binary, "jsonl": scan_jsonl}
+    for path in sorted(paths, key=segment_order):
+        scanners[log_format_of(path)](path, stats_of)
+        stats = stats_of(identifier_of(path))
+        stats.files += 1
+        stats.bytes += os.path.getsize(path)
+
+    for stats in list(sessions.values()):
+        if not stats.lines:
+            del sessions[stats.identifier]  # Only created for a file of other sessions
+        elif interval:
+            stats.interval_ns = int(interval * NS_PER_SECOND)
+    return sessions
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+# Summarize a distribution of nanosecond values in milliseconds
+def distribution(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    mean = sum(ordered) / len(ordered)
+    stdev = (sum((x - mean) ** 2 for x in ordered) / len(ordered)) ** 0.5
+    summary = {"count": len(ordered), "mean_ms": mean / 1e6, "stdev_ms": stdev / 1e6,
+               "min_ms": ordered[0] / 1e6, "max_ms": ordered[-1] / 1e6}
+    for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("p999", 0.999)):
+        summary[f"{name}_ms"] = percentile(ordered, q) / 1e6
+    return summary
+
+# Count intervals by their ratio to the configured interval. The last
+# bucket has no upper bound (None).
+def ratio_histogram(sessions):
+    counts = [0] * (len(RATIO_BUCKETS) + 1)
+    for stats in sessions:
+        expected = stats.expected_interval_ns()
+        if not expected:
+            continue
+        for interval in stats.intervals:
+            counts[bisect_right(RATIO_BUCKETS, interval / expected)] += 1
+    return list(zip(RATIO_BUCKETS + (None,), counts))
+
+# Build the report as a JSON-friendly dict
+def build_report(sessions, late_threshold):
+    all_sessions = list(sessions.values())
+    intervals = array('q')
+    latencies = array('q')
+    for stats in all_sessions:
+        intervals.extend(stats.intervals)
+        latencies.extend(stats.input_latencies)
+
+    report = {"sessions": [], "late_threshold": late_threshold}
+    for stats in all_sessions:
+        duration = stats.duration_s()
+        expected = stats.expected_interval_ns()
+        report["sessions"].append({
+            "id": stats.identifier,
+            "files": stats.files,
+            "bytes": stats.bytes,
+            "lines": stats.lines,
+            "ticks": stats.ticks,
+            "missed_ticks": stats.missed,
+            "late_ticks": stats.late_ticks(late_threshold),
+            "repeated_counters": stats.repeated,
+            "interval_ms": expected / 1e6 if expected else None,
+            "clock": stats.clock,
+            "duration_s": duration,
+            "lines_per_s": stats.lines / duration if duration > 0 else None,
+            "bytes_per_s": stats.bytes / duration if duration > 0 else None,
+            "intervals": distribution(stats.intervals),
+            "input_lines": stats.input_lines,
+            "input_latency": distribution(stats.input_latencies),
+        })
+    report["intervals"] = distribution(intervals)
+    report["interval_ratio_histogram"] = [
+        {"below": bound, "count": count} for bound, count in ratio_histogram(all_sessions)]
+    report["input_latency"] = distribution(latencies)
+    report["totals"] = {
+        "sessions": len(all_sessions),
+        "lines": sum(stats.lines for stats in all_sessions),
+        "bytes": sum(stats.bytes for stats in all_sessions),
+        "ticks": sum(stats.ticks for stats in all_sessions),
+        "missed_ticks": sum(s["missed_ticks"] for s in report["sessions"]),
+        "late_ticks": sum(s["late_ticks"] for s in report["sessions"]),
+    }
+    return report
+
+def format_distribution(summary):
+    return (f"n={summary['count']} mean {summary['mean_ms']:.3f} ms, stdev {summary['stdev_ms']:.3f} ms, "
+            f"min {summary['min_ms']:.3f}, p50 {summary['p50_ms']:.3f}, p90 {summary['p90_ms']:.3f}, "
+            f"p99 {summary['p99_ms']:.3f}, p99.9 {summary['p999_ms']:.3f}, max {summary['max_ms']:.3f} ms")
+
+# Print the report as text
+def print_report(report, out=sys.stdout):
+    out.write(f"{'Session':<10} {'Lines':>10} {'Ticks':>8} {'Missed':>7} {'Late':>6} "
+              f"{'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'Lines/s':>10} {'KiB/s':>9}\n")
+    for session in report["sessions"]:
+        intervals = session["intervals"]
+        cells = [f"{intervals[key]:9.3f}" if intervals else f"{'-':>9}"
+                 for key in ("p50_ms", "p99_ms", "max_ms")]
+        rate = f"{session['lines_per_s']:10.1f}" if session["lines_per_s"] else f"{'-':>10}"
+        kib = f"{session['bytes_per_s'] / 1024:9.1f}" if session["bytes_per_s"] else f"{'-':>9}"
+        out.write(f"{session['id']:<10} {session['lines']:>10} {session['ticks']:>8} "
+                  f"{session['missed_ticks']:>7} {session['late_ticks']:>6} {' '.join(cells)} {rate} {kib}\n")
+
+    totals = report["totals"]
+    out.write(f"\nTotal: {totals['sessions']} sessions, {totals['lines']} lines, {totals['bytes']} bytes, "
+              f"{totals['ticks']} ticks, {totals['missed_ticks']} missed, {totals['late_ticks']} late "
+              f"(more than {report['late_threshold']:.0%} over the interval)\n")
+    if report["intervals"]:
+        out.write(f"Inter-tick intervals: {format_distribution(report['intervals'])}\n")
+        previous = 0
+        for bucket in report["interval_ratio_histogram"]:
+            label = f"{previous:g}-{bucket['below']:g}x" if bucket["below"] is not None else f">={previous:g}x"
+            out.write(f"  {label:>10} {bucket['count']:>10}\n")
+            previous = bucket["below"]
+    if report["input_latency"]:
+        out.write(f"Stdin-to-log latency: {format_distribution(report['input_latency'])}\n")
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure tick intervals, gaps and latency in continuous_logger logs')
+    parser.add_argument('paths', nargs='+',
+                        help='Log files, or directories to search for continuous_log_* files')
+    parser.add_argument('--interval', type=float, default=None,
+                        help='Expected interval in seconds (default: from the log header, '
+                             'or the median interval)')
+    parser.add_argument('--late-threshold', type=float, default=0.5,
+                        help='A tick is late when its interval exceeds the expected one by this '
+                             'fraction (default: 0.5)')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            files.extend(path for path in glob.glob(os.path.join(path, 'continuous_log_*'))
+                         if not path.endswith('.tmp'))  # Segments being compressed
+        else:
+            files.append(path)
+    if not files:
+        parser.error('no log files found')
+
+    report = build_report(analyze(files, args.interval), args.late_threshold)
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
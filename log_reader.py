@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Reader for continuous_logger log files
+
+Reads the text, JSON Lines and binary log formats written by
+continuous_logger.py, including rotated segments compressed with gzip or
+zstd, as records of (monotonic_ns, wall_ns, identifier, type, counter, message).
+- Files are read in fixed-size chunks, compressed segments decompressed as
+  they are read, so memory does not grow with the size of a log
+- Binary records are scanned one by one with struct
+- Text lines carry no monotonic time; their monotonic_ns is None
+- Run as a script to print records as text lines or JSON Lines
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import argparse
+from datetime import datetime
+from continuous_logger import (LOG_FORMATS, RECORD_TYPES, RECORD_HEADER, zstandard,
+                               format_text, format_jsonl)
+
+# "[2024-01-31 12:00:00.123] [identifier] message"
+TEXT_LINE = re.compile(r'\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\.\d{3})\] \[([^\]]*)\] (.*)')
+
+# Identifier in a log file name like continuous_log_<identifier>.log.3.gz
+FILE_NAME = re.compile(r'continuous_log_([^.]+)(\.[a-z]+)')
+
+# Work out the format of a log file from its name
+def log_format_of(path):
+    match = FILE_NAME.search(os.path.basename(path))
+    if match:
+        for log_format, suffix in LOG_FORMATS.items():
+            if match.group(2) == suffix:
+                return log_format
+    return "text"
+
+# The session identifier in a log file name, or "" if it has none
+def identifier_of(path):
+    match = FILE_NAME.search(os.path.basename(path))
+    return match.group(1) if match else ""
+
+# Bytes of a log file read at a time
+CHUNK_SIZE = 64 << 20
+
+# Open a log file as a binary stream; compressed rotated segments are
+# decompressed as they are read
+def open_log_stream(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"Reading {path} needs the zstandard package")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return open(path, 'rb')
+
+# Yield the bytes of a log file in chunks of at most `chunk_size`
+def iter_log_chunks(path, chunk_size=CHUNK_SIZE):
+    with open_log_stream(path) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+# Yield the bytes of a text or JSON Lines log in chunks that end on a line
+# boundary; the partial last line of a chunk is carried over to the next.
+# A partial last line of the file (still being written) is left out.
+def iter_line_chunks(path, chunk_size=CHUNK_SIZE):
+    carry = b''
+    for chunk in iter_log_chunks(path, chunk_size):
+        buffer = carry + chunk if carry else chunk
+        newline = buffer.rfind(b'\n')
+        if newline < 0:
+            carry = buffer
+            continue
+        carry = buffer[newline + 1:]
+        yield buffer[:newline + 1]
+
+# Yield (header fields, buffer, message start, message end) for every
+# complete record of a binary log, read in chunks; the partial last record of
+# a chunk is carried over to the next. A record cut off at the end of the
+# file (still being written) is left out.
+def iter_binary_spans(path, chunk_size=CHUNK_SIZE):
+    unpack_from = RECORD_HEADER.unpack_from
+    header_size = RECORD_HEADER.size
+    carry = b''
+    for chunk in iter_log_chunks(path, chunk_size):
+        buffer = carry + chunk if carry else chunk
+        offset, end = 0, len(buffer)
+        while offset + header_size <= end:
+            fields = unpack_from(buffer, offset)
+            record_end = offset + 4 + fields[0]
+            if record_end > end:
+                break
+            yield fields, buffer, offset + header_size, record_end
+            offset = record_end
+        carry = buffer[offset:]
+
+# Yield every complete record of a binary log
+def iter_binary_records(path, identifier=None):
+    if identifier is None:
+        identifier = identifier_of(path)
+    for fields, buffer, start, end in iter_binary_spans(path):
+        length, mono_ns, wall_ns, counter, type_code = fields
+        message = buffer[start:end].decode(errors='replace')
+        yield (mono_ns, wall_ns, identifier, RECORD_TYPES[type_code], counter, message)
+
+# Yield the records of a JSON Lines log
+def iter_jsonl_records(path):
+    for line in iter_lines(path):
+        if line.strip():
+            item = json.loads(line)
+            yield (item["mono_ns"], item["wall_ns"], item["id"], item["type"],
+                   item["counter"], item["message"])
+
+# Yield the records of a text log. The type and counter are recovered from
+# the message; lines that don't look like log lines are skipped.
+def iter_text_records(path):
+    seconds_of = {}  # "2024-01-31 12:00:00" -> epoch seconds, parsed once per second
+    for line in iter_lines(path):
+        match = TEXT_LINE.match(line)
+        if not match:
+            continue
+        timestamp, identifier, message = match.groups()
+        second = timestamp[:19]
+        seconds = seconds_of.get(second)
+        if seconds is None:
+            seconds = seconds_of[second] = int(datetime.strptime(second, "%Y-%m-%d %H:%M:%S").timestamp())
+        wall_ns = (seconds * 1000 + int(timestamp[20:])) * 1_000_000
+        kind, counter = classify_message(message)
+        yield (None, wall_ns, identifier, kind, counter, message)
+
+# Guess the record type and counter of a text log message
+def classify_message(message):
+    if message.startswith("Counter: "):
+        value = message[9:].split(' ', 1)[0]
+        return "counter", int(value) if value.isdigit() else 0
+    if message.startswith("INPUT: "):
+        return "input", 0
+    if message == "END":
+        return "end", 0
+    if message.startswith("Error"):
+        return "error", 0
+    return "info", 0
+
+# Yield the lines of a (possibly compressed) text log
+def iter_lines(path):
+    for chunk in iter_line_chunks(path):
+        for line in chunk.split(b'\n')[:-1]:
+            yield line.decode(errors='replace')
+
+# Yield the records of a log file in any format
+def iter_log_records(path):
+    log_format = log_format_of(path)
+    if log_format == "binary":
+        return iter_binary_records(path)
+    if log_format == "jsonl":
+        return iter_jsonl_records(path)
+    return iter_text_records(path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Print the records of continuous_logger log files')
+    parser.add_argument('files', nargs='+', help='Log files (.log, .jsonl, .clog, optionally .gz/.zst)')
+    parser.add_argument('--format', choices=('text', 'jsonl'), default='text',
+                        help='Output format (default: text)')
+    parser.add_argument('--type', choices=RECORD_TYPES, action='append',
+                        help='Only print records of this type (repeatable)')
+    args = parser.parse_args()
+
+    formatter = format_jsonl if args.format == 'jsonl' else format_text
+    out = sys.stdout
+    for path in args.files:
+        for record in iter_log_records(path):
+            if args.type and record[3] not in args.type:
+                continue
+            out.write(formatter(record) + '\n')
+
+if __name__ == "__main__":
+    try:
+        main()
+    except BrokenPipeError:
+        pass
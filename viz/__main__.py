@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The viz modules import each other by their plain names
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cli import main
+
+main()
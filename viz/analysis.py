@@ -0,0 +1,117 @@
+from process_events import iter_records
+from event_stream import iter_events
+from event_table import build_event_table
+from table_cache import load_event_table
+from usage import UsageSeries
+from causality import CausalityIndex
+from profiling import stage
+
+class TrajectoryAnalysis:
+    """A trajectory parsed once, with the results shared by all visualizers.
+
+    The events are extracted into EventRecords, and the processed event
+    table and the per-type summary are computed, on first use and then
+    cached. Pass the analysis to any visualizer in place of the raw data.
+    """
+
+    def __init__(self, data, file_path=None, use_cache=False):
+        self._data = data
+        self._records = None
+        self._event_tables = {}  # attribution -> EventTable
+        self._summary_rows = None
+        self._usage_series = None
+        self._causality = None
+        self.file_path = file_path
+        self.use_cache = use_cache
+
+    @classmethod
+    def from_file(cls, file_path, use_cache=True):
+        """Analyze a trajectory file, loading the event table from the on-disk cache if enabled.
+
+        The file itself is only parsed when a visualizer needs the raw events.
+        """
+        return cls(iter_events(file_path), file_path=file_path, use_cache=use_cache)
+
+    @property
+    def records(self):
+        """The EventRecord of every event, in order."""
+        if self._records is None:
+            with stage("load"):
+                self._records = list(iter_records(self._data))
+            self._data = None
+        return self._records
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def event_table(self):
+        """The processed events as an EventTable. Treat it as read-only."""
+        return self.event_table_with("window")
+
+    def event_table_with(self, attribution):
+        """The processed events with costs attributed by `attribution` (see process_events.ATTRIBUTIONS)."""
+        table = self._event_tables.get(attribution)
+        if table is None:
+            with stage(f"process_events ({attribution})"):
+                table = self._build_event_table(attribution)
+            self._event_tables[attribution] = table
+        return table
+
+    def _build_event_table(self, attribution):
+        if self.use_cache and self.file_path is not None:
+            # On a miss reuse the records if they were already parsed, else stream the file
+            data = self._causality if attribution == "exact" and self._causality else self._records
+            build = (lambda: build_event_table(data, attribution)) if data is not None else None
+            return load_event_table(self.file_path, build=build, attribution=attribution)
+        return build_event_table(self.causality if attribution == "exact" else self.records, attribution)
+
+    @property
+    def causality(self):
+        """The events indexed by id, with the next LLM call of each, as a CausalityIndex."""
+        if self._causality is None:
+            records = self.records
+            with stage("causality index"):
+                self._causality = CausalityIndex(records)
+        return self._causality
+
+    @property
+    def usage_series(self):
+        """The per-call LLM usage as a UsageSeries. Treat it as read-only."""
+        if self._usage_series is None:
+            records = self.records
+            with stage("usage series"):
+                self._usage_series = UsageSeries(records)
+        return self._usage_series
+
+    @property
+    def summary_rows(self):
+        """The rows returned by by_type.create_summary_rows. Treat them as read-only."""
+        if self._summary_rows is None:
+            from by_type import create_summary_rows  # by_type imports this module
+            table = self.event_table
+            with stage("aggregate"):
+                self._summary_rows = create_summary_rows(table)
+        return self._summary_rows
+
+def usage_series_of(data):
+    """Return the per-call usage as a UsageSeries, reusing the one of a TrajectoryAnalysis."""
+    if isinstance(data, TrajectoryAnalysis):
+        return data.usage_series
+    return UsageSeries(iter_records(data))
+
+def event_table_of(data, attribution="window"):
+    """Return the processed events as an EventTable, reusing the cached one of a TrajectoryAnalysis."""
+    if isinstance(data, TrajectoryAnalysis):
+        return data.event_table_with(attribution)
+    return build_event_table(data, attribution)
+
+def summary_rows_of(data):
+    """Return the per-type summary rows, reusing the cached ones of a TrajectoryAnalysis."""
+    if isinstance(data, TrajectoryAnalysis):
+        return data.summary_rows
+    from by_type import create_summary_rows
+    return create_summary_rows(build_event_table(data))
@@ -0,0 +1,93 @@
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from event_stream import iter_events
+from event_table import build_event_table
+from table_cache import load_event_table
+from by_type import summary_rows_from_sums, write_html_summary
+
+# Trajectory files picked up when a directory is given
+TRAJECTORY_PATTERNS = ("trajectory-*.json", "trajectory-*.jsonl")
+
+def find_trajectories(paths):
+    """Expand directories and glob patterns into a sorted list of trajectory files."""
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in TRAJECTORY_PATTERNS:
+                files.update(glob.glob(os.path.join(path, pattern)))
+        else:
+            files.update(match for match in glob.glob(path) if os.path.isfile(match))
+    return sorted(files)
+
+def analyze_file(file_path, use_cache=True):
+    """Run the process_events/by-type pipeline on one file and return its per-type sums."""
+    if use_cache:
+        table = load_event_table(file_path)
+    else:
+        table = build_event_table(iter_events(file_path))
+    return len(table), table.group_sums()
+
+def merge_group_sums(merged, grouped_data):
+    """Add the per-type sums of one trajectory into `merged`."""
+    for subt, sums in grouped_data.items():
+        totals = merged.setdefault(subt, dict.fromkeys(sums, 0))
+        for key, value in sums.items():
+            totals[key] += value
+    return merged
+
+def run_batch(files, jobs=None, use_cache=True):
+    """Analyze files across a process pool and return (merged sums, event count, failures)."""
+    merged = {}
+    event_count = 0
+    failures = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(analyze_file, file_path, use_cache): file_path for file_path in files}
+        for future in as_completed(futures):
+            try:
+                rows, grouped_data = future.result()
+            except Exception as e:
+                failures.append((futures[future], e))
+                continue
+            event_count += rows
+            merge_group_sums(merged, grouped_data)
+    return merged, event_count, failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize many trajectories by event type, in parallel.")
+    parser.add_argument("paths", nargs="+",
+                        help="Trajectory files, directories (trajectory-*.json[l]) or glob patterns")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(),
+                        help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Don't read or write the on-disk event table cache")
+    parser.add_argument("--output", default="fleet_by_type.html",
+                        help="Name of the report written to output/ (default: fleet_by_type.html)")
+    parser.add_argument("--no-browser", action="store_true",
+                        help="Only write the report, don't open it in a browser")
+    args = parser.parse_args()
+
+    files = find_trajectories(args.paths)
+    if not files:
+        parser.error("No trajectory files found.")
+
+    start = time.perf_counter()
+    merged, event_count, failures = run_batch(files, args.jobs, use_cache=not args.no_cache)
+    elapsed = time.perf_counter() - start
+
+    for file_path, error in failures:
+        print(f"FAILED {file_path}: {error}")
+    analyzed = len(files) - len(failures)
+    print(f"Analyzed {analyzed} of {len(files)} trajectories ({event_count} processed events) "
+          f"in {elapsed:.2f}s with {args.jobs} workers ({analyzed / elapsed:.1f} files/s)")
+
+    summary_rows = summary_rows_from_sums(merged)
+    output_file = write_html_summary(summary_rows, args.output,
+                                     title=f"Fleet Summary by Type ({analyzed} trajectories)",
+                                     open_browser=not args.no_browser)
+    print(f"Report written to {output_file}")
+
+if __name__ == "__main__":
+    main()
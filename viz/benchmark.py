@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Directory where generated trajectories are kept between runs
+DATA_DIR = os.environ.get("VIZ_BENCH_DIR", ".viz_bench")
+
+# Trajectory sizes, in events, benchmarked by default
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MiB, or None where it can't be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB elsewhere
+
+# Each stage is (setup, run): setup(file_path) prepares the inputs outside the timing,
+# run(inputs) is the timed part.
+
+def _records(file_path):
+    from event_stream import iter_events
+    from process_events import iter_records
+    return list(iter_records(iter_events(file_path)))
+
+def _analysis(file_path, with_table=False):
+    from analysis import TrajectoryAnalysis
+    analysis = TrajectoryAnalysis(_records(file_path))
+    if with_table:
+        analysis.event_table
+    return analysis
+
+def _run_table_reports(analysis):
+    import by_type, completion_cost, input_cost, event_action_obs, all_events
+    for module in (by_type, completion_cost, input_cost, event_action_obs, all_events):
+        module.visualize(analysis)
+
+def _run_charts(analysis):
+    from viz_charts import visualize
+    visualize(analysis, image_format="png")
+
+def _build_table(records):
+    from event_table import build_event_table
+    return build_event_table(records)
+
+def _process(records):
+    from process_events import process_events
+    return process_events(records)
+
+def _process_exact(records):
+    from process_events import process_events
+    return process_events(records, "exact")
+
+def _summarize(table):
+    from by_type import create_summary_rows
+    return create_summary_rows(table)
+
+STAGES = {
+    "parse": (lambda file_path: file_path, _records),
+    "process_events": (_records, _process),
+    "process_events_exact": (_records, _process_exact),
+    "event_table": (_records, _build_table),
+    "summary": (lambda file_path: _build_table(_records(file_path)), _summarize),
+    "html_reports": (lambda file_path: _analysis(file_path, with_table=True), _run_table_reports),
+    "charts": (lambda file_path: _analysis(file_path, with_table=True), _run_charts),
+}
+
+def run_stage(stage, file_path):
+    """Run one stage in this process and return its measurements."""
+    import html_writer
+    html_writer.OPEN_BROWSER = False
+    setup, run = STAGES[stage]
+    inputs = setup(file_path)
+    setup_rss = peak_rss_mb()
+    start = time.perf_counter()
+    run(inputs)
+    wall = time.perf_counter() - start
+    return {"wall_s": round(wall, 6), "peak_rss_mb": peak_rss_mb(), "setup_peak_rss_mb": setup_rss}
+
+def measure(stage, file_path, work_dir):
+    """Run a stage in a fresh interpreter, so its memory and imports are its own."""
+    command = [sys.executable, os.path.abspath(__file__), "--run-stage", stage, os.path.abspath(file_path)]
+    env = dict(os.environ, VIZ_CACHE_DIR=os.path.join(work_dir, "cache"))
+    result = subprocess.run(command, cwd=work_dir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Stage {stage} failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def trajectory_for(size, seed, data_dir=DATA_DIR):
+    """The path of the generated trajectory of `size` events, generating it on first use."""
+    from synthetic import write_trajectory
+    os.makedirs(data_dir, exist_ok=True)
+    file_path = os.path.join(data_dir, f"trajectory-synthetic-{size}-seed{seed}.json")
+    if not os.path.exists(file_path):
+        print(f"Generating {size} events into {file_path}...", file=sys.stderr)
+        write_trajectory(file_path, size, seed)
+    return file_path
+
+def run_benchmarks(sizes, stages, repeat=1, seed=0, data_dir=DATA_DIR):
+    """Run every stage on a trajectory of every size and return the result document."""
+    results = []
+    with tempfile.TemporaryDirectory(prefix="viz-bench-") as work_dir:
+        for size in sizes:
+            file_path = trajectory_for(size, seed, data_dir)
+            for stage in stages:
+                runs = [measure(stage, file_path, work_dir) for _ in range(repeat)]
+                best = min(runs, key=lambda run: run["wall_s"])
+                result = {"stage": stage, "events": size, "wall_s": best["wall_s"],
+                          "wall_s_runs": [run["wall_s"] for run in runs],
+                          "peak_rss_mb": max((run["peak_rss_mb"] or 0) for run in runs) or None,
+                          "setup_peak_rss_mb": best["setup_peak_rss_mb"]}
+                results.append(result)
+                print(format_result(result), file=sys.stderr)
+    return {"meta": environment(seed), "results": results}
+
+def environment(seed):
+    import numpy
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "platform": platform.platform(),
+        "seed": seed,
+    }
+
+def format_result(result, baseline=None):
+    rss = f"{result['peak_rss_mb']:8.1f} MiB" if result["peak_rss_mb"] is not None else "       n/a"
+    line = f"{result['stage']:<22} {result['events']:>9} events {result['wall_s']:9.3f} s {rss}"
+    if baseline is not None:
+        line += f"   {result['wall_s'] / baseline['wall_s']:5.2f}x time" if baseline["wall_s"] else ""
+        if result["peak_rss_mb"] and baseline["peak_rss_mb"]:
+            line += f" {result['peak_rss_mb'] / baseline['peak_rss_mb']:5.2f}x memory"
+    return line
+
+def print_comparison(document, baseline):
+    """Print every result next to the same stage and size of a baseline result document."""
+    previous = {(result["stage"], result["events"]): result for result in baseline["results"]}
+    print(f"Compared with {baseline['meta'].get('commit')} ({baseline['meta'].get('date')}):")
+    for result in document["results"]:
+        print(format_result(result, previous.get((result["stage"], result["events"]))))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the viz pipeline on generated trajectories.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated trajectory sizes in events (default: %(default)s)")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help="Comma-separated stages to run (default: all of %(default)s)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per stage; the fastest is kept (default: 1)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated trajectories (default: 0)")
+    parser.add_argument("--data-dir", default=DATA_DIR, help=f"Where generated trajectories are kept (default: {DATA_DIR})")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Results JSON of an earlier run to compare with")
+    parser.add_argument("--run-stage", nargs=2, metavar=("STAGE", "FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        print(json.dumps(run_stage(*args.run_stage)))
+        return
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s) {', '.join(unknown)}; choose from {', '.join(STAGES)}")
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    document = run_benchmarks(sizes, stages, args.repeat, args.seed, args.data_dir)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(document, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,21 @@
-from common import select_and_load_json, save_and_open_html
-from process_events import process_events
-import webbrowser
-import os
-from collections import defaultdict
+from common import select_and_stream_json
+from analysis import summary_rows_of
+from event_table import EventTable
+from html_writer import HtmlTableWriter, STICKY_TABLE_STYLE
 
-def create_summary_rows(table_rows):
-    """Create summary rows grouped by 'subt'."""
-    # Filter out rows with 'special' set
-    filtered_rows = [row for row in table_rows if not row["special"]]
+def create_summary_rows(table):
+    """Create summary rows grouped by 'subt'.
 
-    # Group rows by 'subt' and calculate aggregates
-    grouped_data = defaultdict(lambda: {
-        "count": 0,
-        "sum_cache_creation_tokens": 0,
-        "sum_completion_tokens": 0,
-        "sum_cache_creation_cost": 0.0,
-        "sum_completion_cost": 0.0,
-        "sum_event_cost": 0.0
-    })
+    `table` is an EventTable or a list of processed event rows.
+    """
+    if not isinstance(table, EventTable):
+        table = EventTable.from_rows(table)
 
-    for row in filtered_rows:
-        subt = row["subt"]
-        grouped_data[subt]["count"] += 1
-        grouped_data[subt]["sum_cache_creation_tokens"] += row["cache_creation_tokens"]
-        grouped_data[subt]["sum_completion_tokens"] += row["completion_tokens"]
-        grouped_data[subt]["sum_cache_creation_cost"] += float(row["cache_creation_cost"].strip("$"))
-        grouped_data[subt]["sum_completion_cost"] += float(row["completion_cost"].strip("$"))
-        grouped_data[subt]["sum_event_cost"] += float(row["event_cost"].strip("$"))
+    # Group rows by 'subt' and sum them, leaving out rows with 'special' set
+    return summary_rows_from_sums(table.group_sums())
 
+def summary_rows_from_sums(grouped_data):
+    """Turn per-type sums from EventTable.group_sums into summary rows with averages."""
     # Prepare rows for the summary table
     summary_rows = []
     for subt, data in grouped_data.items():
@@ -56,98 +44,51 @@ def create_summary_rows(table_rows):
 
     return summary_rows
 
-def generate_html_summary(table_rows):
-    """Generate a summary HTML table grouped by 'subt'."""
-    # Use the reusable function to create summary rows
-    summary_rows = create_summary_rows(table_rows)
+HEADERS = [
+    "Subt", "Count",
+    "Sum Cache Creation Tokens", "Avg Cache Creation Tokens",
+    "Sum Completion Tokens", "Avg Completion Tokens",
+    "Sum Cache Creation Cost", "Avg Cache Creation Cost",
+    "Sum Completion Cost", "Avg Completion Cost",
+    "Sum Event Cost", "Avg Event Cost",
+]
 
-    # Generate HTML rows for the summary table
-    html_rows = [
-        f"""
-        <tr>
-            <td>{row['subt']}</td>
-            <td>{row['count']}</td>
-            <td>{row['sum_cache_creation_tokens']}</td>
-            <td>{row['avg_cache_creation_tokens']:.2f}</td>
-            <td>{row['sum_completion_tokens']}</td>
-            <td>{row['avg_completion_tokens']:.2f}</td>
-            <td>${row['sum_cache_creation_cost']:.2f}</td>
-            <td>${row['avg_cache_creation_cost']:.2f}</td>
-            <td>${row['sum_completion_cost']:.2f}</td>
-            <td>${row['avg_completion_cost']:.2f}</td>
-            <td>${row['sum_event_cost']:.2f}</td>
-            <td>${row['avg_event_cost']:.2f}</td>
-        </tr>
-        """
-        for row in summary_rows
-    ]
+def format_summary_row(row):
+    """Format a summary row for display."""
+    return (
+        row['subt'],
+        row['count'],
+        row['sum_cache_creation_tokens'],
+        f"{row['avg_cache_creation_tokens']:.2f}",
+        row['sum_completion_tokens'],
+        f"{row['avg_completion_tokens']:.2f}",
+        f"${row['sum_cache_creation_cost']:.2f}",
+        f"${row['avg_cache_creation_cost']:.2f}",
+        f"${row['sum_completion_cost']:.2f}",
+        f"${row['avg_completion_cost']:.2f}",
+        f"${row['sum_event_cost']:.2f}",
+        f"${row['avg_event_cost']:.2f}",
+    )
 
-    # Generate HTML content for the summary table
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Summary by Type</title>
-        <style>
-            table {{
-                width: 100%;
-                border-collapse: collapse;
-                table-layout: auto;
-            }}
-            th, td {{
-                border: 1px solid black;
-                padding: 8px;
-                text-align: left;
-            }}
-            th {{
-                background-color: #f2f2f2;
-                position: sticky;
-                top: 0;
-                z-index: 1;
-            }}
-        </style>
-    </head>
-    <body>
-        <h1>Summary by Type</h1>
-        <table>
-            <thead>
-                <tr>
-                    <th>Subt</th>
-                    <th>Count</th>
-                    <th>Sum Cache Creation Tokens</th>
-                    <th>Avg Cache Creation Tokens</th>
-                    <th>Sum Completion Tokens</th>
-                    <th>Avg Completion Tokens</th>
-                    <th>Sum Cache Creation Cost</th>
-                    <th>Avg Cache Creation Cost</th>
-                    <th>Sum Completion Cost</th>
-                    <th>Avg Completion Cost</th>
-                    <th>Sum Event Cost</th>
-                    <th>Avg Event Cost</th>
-                </tr>
-            </thead>
-            <tbody>
-                {''.join(html_rows)}
-            </tbody>
-        </table>
-    </body>
-    </html>
-    """
-    return html_content
+def write_html_summary(summary_rows, filename="by_type.html", title="Summary by Type", open_browser=None,
+                       stream=None):
+    """Write a summary HTML table grouped by 'subt' and return the path of the report.
 
-def visualize(data=None):
-    # Process events into a list of objects
-    table_rows = process_events(data)
+    With `stream` the page is written into that text stream instead, and None is returned.
+    """
+    with HtmlTableWriter(filename, title, HEADERS, style=STICKY_TABLE_STYLE,
+                         open_browser=open_browser, stream=stream) as writer:
+        writer.write_rows(format_summary_row(row) for row in summary_rows)
+    return writer.output_file
 
-    # Generate HTML content for the summary table
-    html_content = generate_html_summary(table_rows)
+def visualize(data=None, stream=None):
+    # Process events and group them by type
+    summary_rows = summary_rows_of(data)
 
-    # Save and open the HTML file
-    save_and_open_html(html_content, "by_type.html")
+    # Write and open the summary table
+    write_html_summary(summary_rows, stream=stream)
 
 if __name__ == "__main__":
     # Load the selected JSON file
-    data = select_and_load_json()
+    data = select_and_stream_json()
     visualize(data)
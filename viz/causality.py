@@ -0,0 +1,48 @@
+import numpy as np
+
+class CausalityIndex:
+    """The event records of a trajectory indexed by id, for walking up chains of causes.
+
+    Built in one pass over the records. Looks up an event by id, the action
+    that caused an observation and the next LLM call after an event, each
+    in constant time.
+    """
+
+    def __init__(self, records):
+        self.records = records if isinstance(records, list) else list(records)
+        self.positions = {}  # id -> position in `records`
+        has_call = np.zeros(len(self.records), dtype=bool)
+        for position, record in enumerate(self.records):
+            self.positions.setdefault(record.id, position)
+            has_call[position] = bool(record.call_usage)
+
+        # next_call[i] is the position of the first event after i that reports a new LLM call, or -1
+        calls = np.flatnonzero(has_call)
+        following = np.searchsorted(calls, np.arange(len(self.records)), side="right")
+        self.next_call = np.append(calls, -1)[following]
+
+    def __len__(self):
+        return len(self.records)
+
+    def event(self, event_id):
+        """The record with this id, or None."""
+        position = self.positions.get(event_id)
+        return self.records[position] if position is not None else None
+
+    def cause_of(self, record):
+        """The record of the event that caused `record`, or None."""
+        return self.event(record.cause) if record.cause is not None else None
+
+    def causing_action(self, record):
+        """The action at the root of `record`'s chain of causes, or None if it has no cause."""
+        cause = self.cause_of(record)
+        for _ in range(len(self.records)):  # Bounded, in case ids form a cycle
+            if cause is None or cause.event_type == "action":
+                break
+            cause = self.cause_of(cause)
+        return cause
+
+    def following_call(self, position):
+        """The record reporting the first LLM call after the event at `position`, or None."""
+        call = self.next_call[position]
+        return self.records[call] if call >= 0 else None
@@ -0,0 +1,203 @@
+import argparse
+import importlib
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from operator import attrgetter, methodcaller
+import profiling
+from common import has_display
+from profiling import stage
+
+# Report name -> (module with a visualize(data, ...) function, extra arguments by option name).
+# Modules are imported only when their report is selected.
+REPORTS = {
+    "charts": ("viz_charts", {"image_format": "chart_format"}),
+    "completion_cost": ("completion_cost", {}),
+    "by_type": ("by_type", {}),
+    "input_cost": ("input_cost", {}),
+    "event_action_obs": ("event_action_obs", {"layout": "layout", "event_links": "event_links"}),
+    "all_events": ("all_events", {"layout": "layout", "event_links": "event_links"}),
+}
+
+# What each report reads from the analysis. Computed once before the reports are rendered
+# in parallel, so every worker process inherits it instead of computing it again. The
+# charts aren't listed: their worker starts before this and computes its own.
+SHARED_INPUTS = {
+    "completion_cost": (attrgetter("usage_series"),),
+    "by_type": (attrgetter("summary_rows"),),
+    "input_cost": (attrgetter("records"),),
+    "event_action_obs": (methodcaller("event_table_with", "exact"),),
+    "all_events": (attrgetter("records"),),
+}
+
+# Tools that have their own command line: python -m viz <command> [options]
+COMMANDS = {
+    "follow": "follow",
+    "serve": "server",
+    "batch": "batch",
+    "generate": "synthetic",
+    "bench": "benchmark",
+    "event": "event_index",
+}
+
+def parse_report_names(value):
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in REPORTS]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown report(s) {', '.join(unknown)}; choose from {', '.join(REPORTS)}")
+    return names
+
+def render_report(analysis, name, arguments):
+    """Write one report with the given extra arguments; return the seconds it took."""
+    start = time.perf_counter()
+    with stage(f"report: {name}"):
+        module = importlib.import_module(REPORTS[name][0])
+        result = module.visualize(analysis, **arguments)
+    if name == "charts":
+        for path in result:
+            print(f"Chart saved to {path}")
+    return time.perf_counter() - start
+
+# The analysis the reports are rendered from, in the worker processes of a parallel run
+_worker_analysis = None
+
+def _load_worker_analysis(file_path, use_cache, open_browser):
+    """Initializer of spawned workers, which can't inherit the analysis: load it from the file."""
+    global _worker_analysis
+    import html_writer
+    from analysis import TrajectoryAnalysis
+    html_writer.OPEN_BROWSER = open_browser
+    _worker_analysis = TrajectoryAnalysis.from_file(file_path, use_cache=use_cache)
+
+def _render_in_worker(name, arguments):
+    return render_report(_worker_analysis, name, arguments)
+
+def run_reports(file_path, names, options, use_cache=True, jobs=1):
+    """Write the selected reports of one trajectory; return [(name, seconds)].
+
+    With `jobs` > 1 the reports are rendered by that many worker processes.
+    The charts, the slowest report, get a worker of their own that is
+    started first and computes its own inputs, so they overlap the rest.
+    The inputs the other reports share are computed next, in this process
+    (timed as "shared inputs"), and their workers are forked afterwards so
+    they inherit them. The run can't take less than the charts alone.
+    Where processes can't be forked, each worker loads the analysis from the
+    file, sharing the processed event tables through the on-disk cache.
+    """
+    global _worker_analysis
+    from analysis import TrajectoryAnalysis
+    analysis = TrajectoryAnalysis.from_file(file_path, use_cache=use_cache)
+    arguments = {name: {argument: getattr(options, option) for argument, option in REPORTS[name][1].items()}
+                 for name in names}
+    if jobs <= 1 or len(names) <= 1:
+        return [(name, render_report(analysis, name, arguments[name])) for name in names]
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        context, initializer, initargs = multiprocessing.get_context("fork"), None, ()
+        _worker_analysis = analysis
+    else:
+        import html_writer
+        context, initializer = multiprocessing.get_context("spawn"), _load_worker_analysis
+        initargs = (file_path, use_cache, html_writer.OPEN_BROWSER)
+    first = ["charts"] if "charts" in names else []
+    rest = [name for name in names if name not in first]
+    futures = {}
+    try:
+        # A forking pool starts all its workers on the first submit, so the
+        # charts worker runs while the shared inputs below are computed
+        with ProcessPoolExecutor(len(first) or 1, mp_context=context,
+                                 initializer=initializer, initargs=initargs) as first_pool:
+            for name in first:
+                futures[name] = first_pool.submit(_render_in_worker, name, arguments[name])
+
+            start = time.perf_counter()
+            with stage("shared inputs"):
+                for compute in dict.fromkeys(compute for name in rest for compute in SHARED_INPUTS[name]):
+                    compute(analysis)
+            timings = [("shared inputs", time.perf_counter() - start)]
+
+            if rest:
+                with ProcessPoolExecutor(max(1, min(jobs - len(first), len(rest))), mp_context=context,
+                                         initializer=initializer, initargs=initargs) as pool:
+                    for name in rest:
+                        futures[name] = pool.submit(_render_in_worker, name, arguments[name])
+            timings += [(name, futures[name].result()) for name in names]
+    finally:
+        _worker_analysis = None
+    return timings
+
+def report(args):
+    if args.file is None:
+        if not args.pick:
+            raise SystemExit("report: give a trajectory FILE, or --pick to choose one in a dialog")
+        from common import select_json_file
+        args.file = select_json_file()
+    if args.no_browser or not has_display():
+        import html_writer
+        html_writer.OPEN_BROWSER = False
+
+    jobs = args.jobs or os.cpu_count() or 1
+    if (args.profile or args.profile_dir) and jobs > 1:
+        raise SystemExit("report: --profile only sees the stages of its own process; use it with --jobs 1")
+    if args.profile or args.profile_dir:
+        profiling.enable(memory=not args.no_trace_memory, profile_dir=args.profile_dir)
+    start = time.perf_counter()
+    try:
+        timings = run_reports(args.file, args.only or list(REPORTS), args, use_cache=not args.no_cache, jobs=jobs)
+    finally:
+        profiler = profiling.disable()
+    for name, seconds in timings:
+        print(f"{name:<18} {seconds * 1000:8.1f} ms")
+    if jobs > 1 and len(timings) > 2:
+        # Less than the sum when the reports overlapped
+        print(f"{'sum':<18} {sum(seconds for _, seconds in timings) * 1000:8.1f} ms")
+    print(f"{'total':<18} {(time.perf_counter() - start) * 1000:8.1f} ms")
+    if profiler is not None:
+        print()
+        profiler.print_summary()
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in COMMANDS:
+        # Hand the remaining arguments to the tool's own parser
+        module = importlib.import_module(COMMANDS[argv[0]])
+        sys.argv = [f"viz {argv[0]}"] + argv[1:]
+        return module.main()
+
+    parser = argparse.ArgumentParser(prog="python -m viz", description="Cost reports for agent trajectories.")
+    commands = parser.add_subparsers(dest="command", required=True,
+                                     metavar="{report," + ",".join(COMMANDS) + "}")
+    report_parser = commands.add_parser("report", help="Write the HTML reports and charts of a trajectory")
+    report_parser.add_argument("file", nargs="?", help="Trajectory file (JSON array or JSON Lines)")
+    report_parser.add_argument("--only", type=parse_report_names, metavar="NAMES",
+                               help=f"Comma-separated reports to write (default: all of {','.join(REPORTS)})")
+    report_parser.add_argument("--pick", action="store_true",
+                               help="Choose the file in a Tk dialog when no FILE is given")
+    report_parser.add_argument("--layout", choices=("table", "virtual", "pages"),
+                               help="Layout of the long event tables (default: VIZ_TABLE_LAYOUT or table)")
+    report_parser.add_argument("--chart-format", choices=("png", "svg"), default="png",
+                               help="Image format of the charts (default: png)")
+    report_parser.add_argument("--event-links", metavar="URL",
+                               help='Link event ids to this URL, with "{id}" replaced by the id '
+                                    '(e.g. http://127.0.0.1:8000/event/{id} of python -m viz serve)')
+    report_parser.add_argument("-j", "--jobs", type=int, default=1, metavar="N",
+                               help="Render the reports in N processes; 0 for one per CPU (default: 1). "
+                                    "The charts take the longest, so no N makes the run faster than they are alone")
+    report_parser.add_argument("--no-cache", action="store_true", help="Don't use the processed event cache")
+    report_parser.add_argument("--no-browser", action="store_true",
+                               help="Only write the reports, don't open them in a browser")
+    report_parser.add_argument("--profile", action="store_true",
+                               help="Time every pipeline stage, trace its peak memory and print a summary")
+    report_parser.add_argument("--profile-dir", metavar="DIR",
+                               help="Also dump cProfile stats of every top-level stage to DIR (implies --profile)")
+    report_parser.add_argument("--no-trace-memory", action="store_true",
+                               help="With --profile, only time the stages; tracemalloc slows Python code down")
+    for command, module in COMMANDS.items():
+        commands.add_parser(command, help=f"Run {module}.py (see python -m viz {command} --help)", add_help=False)
+
+    args = parser.parse_args(argv)
+    if args.command == "report":
+        report(args)
@@ -1,34 +1,42 @@
 import json
-from tkinter import Tk
-from tkinter.filedialog import askopenfilename
 import os
-import webbrowser
+import sys
+from event_stream import iter_events
 
 # Define cost rates in USD per token (per million tokens)
 COST_PER_COMPLETION_TOKEN = 15.00 / 1000 / 1000
 COST_PER_CACHE_WRITE_TOKEN = 3.75 / 1000 / 1000
 COST_PER_CACHE_READ_TOKEN = 0.30 / 1000 / 1000
 
-def select_and_load_json():
-    """Open a file dialog to select a JSON file and load its content."""
+def has_display():
+    """Whether windows (file dialogs, charts, browsers) can be shown."""
+    if sys.platform in ("win32", "darwin"):
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+def select_json_file():
+    """Open a file dialog to select a JSON file and return its path."""
+    # Imported here so that headless runs never load Tk
+    from tkinter import Tk
+    from tkinter.filedialog import askopenfilename
     Tk().withdraw()  # Hide the root Tkinter window
     file_path = askopenfilename(
         title="Select JSON File",
-        filetypes=[("JSON Files", "*.json"), ("All Files", "*.*")]
+        filetypes=[("JSON Files", "*.json"), ("JSON Lines Files", "*.jsonl"), ("All Files", "*.*")]
     )
     if not file_path:
         raise FileNotFoundError("No file selected.")
-    
-    with open(file_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return file_path
 
+def select_and_load_json():
+    """Open a file dialog to select a JSON file and load its content."""
+    file_path = select_json_file()
+    if file_path.endswith(".jsonl"):
+        return list(iter_events(file_path))
 
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
 
-def save_and_open_html(html_content, filename):
-    """Save HTML content to a file and open it in the default web browser."""
-    output_dir = "output"
-    os.makedirs(output_dir, exist_ok=True)
-    output_file = os.path.join(output_dir, filename)
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(html_content)
-    webbrowser.open(output_file)
+def select_and_stream_json():
+    """Open a file dialog to select a trajectory file and return an iterator over its events."""
+    return iter_events(select_json_file())
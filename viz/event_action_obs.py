@@ -1,94 +1,34 @@
 from common import *
-from process_events import process_events
+from analysis import event_table_of
+from html_writer import open_table_writer, STICKY_TABLE_STYLE
 
-def generate_html(table_rows):
-    """Generate HTML content from processed event objects."""
-    html_rows = [
-        f"""
-        <tr>
-            {''.join(f'<td>{row[key]}</td>' for key in row)}
-        </tr>
-        """
-        for row in table_rows
-    ]
+HEADERS = [
+    "ID", "Timestamp", "Source", "Message", "Subt",
+    "Cache Read Tokens", "Cache Creation Tokens", "Completion Tokens",
+    "Cache Read Cost", "Cache Creation Cost", "Completion Cost",
+    "Event Cost(excluding cache-read)", "Total Cost", "Special",
+]
 
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Event Action+Obs combined Visualizer</title>
-        <style>
-            table {{
-                width: 100%;
-                border-collapse: collapse;
-                table-layout: auto; /* Change from fixed to auto */
-            }}
-            th, td {{
-                border: 1px solid black;
-                padding: 8px;
-                text-align: left;
-                width: auto; /* Allow columns to autofit content */
-            }}
-            th {{
-                background-color: #f2f2f2;
-                position: sticky;
-                top: 0;
-                z-index: 1;
-            }}
-            tbody {{
-                overflow-y: auto;
-                max-height: 500px;
-            }}
-            thead, tbody tr {{
-                /* Remove display: block to ensure proper alignment */
-            }}
-        </style>
-    </head>
-    <body>
-        <h1>Action/Observation Visualizer</h1>
-        <table>
-            <thead>
-                <tr>
-                    <th>ID</th>
-                    <th>Timestamp</th>
-                    <th>Source</th>
-                    <th>Message</th>
-                    <th>Subt</th>
-                    <th>Cache Read Tokens</th>
-                    <th>Cache Creation Tokens</th>
-                    <th>Completion Tokens</th>
-                    <th>Cache Read Cost</th>
-                    <th>Cache Creation Cost</th>
-                    <th>Completion Cost</th>
-                    <th>Event Cost(excluding cache-read)</th>
-                    <th>Total Cost</th>
-                    <th>Special</th>
-                </tr>
-            </thead>
-            <tbody>
-                {''.join(html_rows)}
-            </tbody>
-        </table>
-    </body>
-    </html>
-    """
-    return html_content
-
-def visualize(data=None):
-    # Process events into a list of objects
-    table_rows = process_events(data)
+def visualize(data=None, layout=None, stream=None, event_links=None):
+    """Write the processed events by cost; `layout` is one of html_writer.LAYOUTS.
 
-    # Sort table_rows by event_cost in descending order
-    table_rows.sort(key=lambda row: float(row["event_cost"].strip("$")), reverse=True)
+    Pass `stream` to write the page into an open text stream instead of a file,
+    and `event_links` (a URL template with "{id}") to link every ID to the event.
+    """
+    # Process events into a columnar table, attributing costs by causality
+    table = event_table_of(data, attribution="exact")
 
-    # Generate HTML content for the main table
-    html_content = generate_html(table_rows)
+    # Sort the table by event_cost in descending order
+    table = table.sorted_by("event_cost", descending=True)
 
-    save_and_open_html(html_content, "event_action_obs.html")
+    # Stream the rows into the report
+    with open_table_writer("event_action_obs.html", "Event Action+Obs combined Visualizer", HEADERS,
+                           layout=layout, style=STICKY_TABLE_STYLE,
+                           heading="Action/Observation Visualizer", stream=stream,
+                           links={0: event_links} if event_links else None) as writer:
+        writer.write_rows(table.format_rows())
 
 if __name__ == "__main__":
     # Load the selected JSON file
-    data = select_and_load_json()
+    data = select_and_stream_json()
     visualize(data)
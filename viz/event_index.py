@@ -0,0 +1,193 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import numpy as np
+from event_stream import EventStreamDecoder, CHUNK_SIZE
+
+# The sidecar index of a trajectory is written next to it, as <trajectory><INDEX_SUFFIX>
+INDEX_SUFFIX = ".evidx"
+
+# Sidecar header: magic, size and mtime of the indexed trajectory, number of events, first id, dense flag.
+# It is followed by the ids (int64, sorted), byte offsets (int64) and byte lengths (uint32) of the events.
+INDEX_MAGIC = b"VZEVIDX1"
+HEADER = struct.Struct("<8sQqQq?7x")
+
+def index_path_for(file_path):
+    return file_path + INDEX_SUFFIX
+
+def scan_event_spans(file_path, allow_partial=False, chunk_size=CHUNK_SIZE):
+    """Yield (event id, byte offset, byte length) of every event with an integer id, in file order.
+
+    The file is decoded as latin-1, so positions in the text are byte
+    offsets; the JSON structure and numeric ids are ASCII either way. With
+    `allow_partial` an unfinished last event, as in a trajectory that is
+    still being written, is left out instead of raising ValueError.
+    """
+    decoder = EventStreamDecoder(with_spans=True)
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield from _id_spans(decoder.feed(chunk.decode("latin-1")))
+    try:
+        yield from _id_spans(decoder.feed("", final=True))
+    except ValueError:
+        if not allow_partial:
+            raise
+
+def _id_spans(spans):
+    for event, start, end in spans:
+        event_id = event.get("id") if isinstance(event, dict) else None
+        if isinstance(event_id, int) and not isinstance(event_id, bool):
+            yield event_id, start, end - start
+
+def build_event_index(file_path, index_path=None, allow_partial=False):
+    """Scan a trajectory once and write its sidecar index; return the index path."""
+    index_path = index_path or index_path_for(file_path)
+    stat = os.stat(file_path)
+    spans = np.array(list(scan_event_spans(file_path, allow_partial)), dtype=np.int64).reshape(-1, 3)
+
+    # Sort by id, keeping the first of any duplicate ids
+    ids = spans[:, 0]
+    order = np.argsort(ids, kind="stable")
+    spans = spans[order]
+    if len(spans):
+        keep = np.ones(len(spans), dtype=bool)
+        keep[1:] = spans[1:, 0] != spans[:-1, 0]
+        spans = spans[keep]
+    ids = np.ascontiguousarray(spans[:, 0])
+    first_id = int(ids[0]) if len(ids) else 0
+    dense = bool(len(ids)) and int(ids[-1]) - first_id == len(ids) - 1
+
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, len(ids), first_id, dense))
+        f.write(ids.tobytes())
+        f.write(np.ascontiguousarray(spans[:, 1]).tobytes())
+        f.write(spans[:, 2].astype(np.uint32).tobytes())
+    os.replace(tmp_path, index_path)
+    return index_path
+
+class EventIndex:
+    """Random access to the events of a trajectory file through its sidecar index.
+
+    Both the index and the trajectory are memory-mapped, so opening is
+    cheap and looking up an event only reads that event's bytes. When the
+    ids are consecutive an id maps straight to its position in the index;
+    otherwise it is found by binary search. Use `open_event_index` to get
+    one that is built or rebuilt as needed.
+    """
+
+    def __init__(self, file_path, index_path=None):
+        self.file_path = file_path
+        self.index_path = index_path or index_path_for(file_path)
+        with open(self.index_path, "rb") as f:
+            self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.source_size, self.source_mtime_ns, count, self.first_id, self.dense = \
+            HEADER.unpack_from(self._index)
+        if magic != INDEX_MAGIC:
+            self._index.close()
+            raise ValueError(f"{self.index_path} is not an event index.")
+        offset = HEADER.size
+        self.ids = np.frombuffer(self._index, dtype=np.int64, count=count, offset=offset)
+        self.offsets = np.frombuffer(self._index, dtype=np.int64, count=count, offset=offset + 8 * count)
+        self.lengths = np.frombuffer(self._index, dtype=np.uint32, count=count, offset=offset + 16 * count)
+        self._data = None
+
+    def is_stale(self):
+        """True when the trajectory changed since the index was built."""
+        stat = os.stat(self.file_path)
+        return (stat.st_size, stat.st_mtime_ns) != (self.source_size, self.source_mtime_ns)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, event_id):
+        return self._position(event_id) is not None
+
+    def _position(self, event_id):
+        if self.dense:
+            position = event_id - self.first_id
+            return position if 0 <= position < len(self.ids) else None
+        position = int(np.searchsorted(self.ids, event_id))
+        return position if position < len(self.ids) and self.ids[position] == event_id else None
+
+    def span(self, event_id):
+        """(byte offset, byte length) of an event in the trajectory; KeyError if it isn't indexed."""
+        position = self._position(event_id)
+        if position is None:
+            raise KeyError(event_id)
+        return int(self.offsets[position]), int(self.lengths[position])
+
+    def raw(self, event_id):
+        """The JSON text of an event, as bytes exactly as in the trajectory."""
+        offset, length = self.span(event_id)
+        if self._data is None:
+            with open(self.file_path, "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._data[offset:offset + length]
+
+    def event(self, event_id):
+        """The event with id `event_id` as a dict."""
+        return json.loads(self.raw(event_id))
+
+    def close(self):
+        # The id arrays are views of the index mapping; drop them before closing it
+        self.ids = self.offsets = self.lengths = None
+        self._index.close()
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def open_event_index(file_path, index_path=None, rebuild=False, allow_partial=False):
+    """Open the sidecar index of a trajectory, building it first if it is missing or stale."""
+    index_path = index_path or index_path_for(file_path)
+    if not rebuild:
+        try:
+            index = EventIndex(file_path, index_path)
+        except (OSError, ValueError, struct.error):
+            pass
+        else:
+            if not index.is_stale():
+                return index
+            index.close()
+    build_event_index(file_path, index_path, allow_partial)
+    return EventIndex(file_path, index_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Print events of a trajectory by id, through its sidecar index.")
+    parser.add_argument("file", help="Trajectory file (JSON array or JSON Lines)")
+    parser.add_argument("ids", nargs="*", type=int, help="Ids of the events to print; none only builds the index")
+    parser.add_argument("--raw", action="store_true", help="Print the events' JSON exactly as in the file")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index even if it is up to date")
+    args = parser.parse_args()
+
+    with open_event_index(args.file, rebuild=args.rebuild) as index:
+        if not args.ids:
+            layout = "dense" if index.dense else "sparse"
+            print(f"{len(index)} events indexed in {index.index_path} ({layout} ids)")
+        missing = False
+        for event_id in args.ids:
+            try:
+                raw = index.raw(event_id)
+            except KeyError:
+                print(f"No event with id {event_id}", file=sys.stderr)
+                missing = True
+                continue
+            print(raw.decode("utf-8") if args.raw else json.dumps(json.loads(raw), indent=2, ensure_ascii=False))
+    if missing:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import json
+import re
+
+# Characters JSON allows between values
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Read the trajectory in chunks of this many characters
+CHUNK_SIZE = 1 << 20
+
+class EventStreamDecoder:
+    """Incrementally decode events from a JSON array or JSON Lines text.
+
+    Text is fed in arbitrary chunks and complete events are returned as soon
+    as they are available, so only the event currently being read is kept in
+    memory. The format is detected from the first non-whitespace character:
+    a '[' starts a JSON array, anything else is treated as JSON Lines.
+
+    With `with_spans` every event is returned as (event, start, end), where
+    start and end are the positions of its text among all the text fed.
+    """
+
+    def __init__(self, with_spans=False):
+        self._decoder = json.JSONDecoder()
+        self._with_spans = with_spans
+        self._consumed = 0  # Characters fed before the start of _buffer
+        self._chunks = []
+        self._buffered = 0
+        self._buffer = ""
+        self._pos = 0
+        self._format = None  # "array" or "lines" once detected
+        self._expect = "first"  # array state: "first", "value", "separator" or "done"
+        self._expect_before_close = None  # The state the closing ']' was read in
+        self._wait_for = 0  # Don't retry an incomplete event until this many characters are buffered
+
+    def feed(self, text, final=False):
+        """Add a chunk of text and return the list of events completed by it."""
+        self._chunks.append(text)
+        self._buffered += len(text)
+        if not final and self._buffered < self._wait_for:
+            return []
+
+        self._consumed += self._pos
+        self._buffer = self._buffer[self._pos:] + "".join(self._chunks)
+        self._pos = 0
+        self._chunks = []
+        self._wait_for = 0
+
+        events = []
+        while self._decode_next(events, final):
+            pass
+        self._buffered = len(self._buffer) - self._pos
+
+        if final:
+            if self._format == "array" and self._expect != "done":
+                raise ValueError("Trajectory ended before the closing ']' of the JSON array.")
+            self._buffer = ""
+            self._pos = 0
+        return events
+
+    def drain(self):
+        """Decode everything fed so far, even a partial event that would otherwise wait for more text."""
+        self._wait_for = 0
+        return self.feed("")
+
+    def pending_text(self):
+        """Return the text fed but not yet consumed (a partial event and whitespace)."""
+        return self._buffer[self._pos:] + "".join(self._chunks)
+
+    @property
+    def closed(self):
+        """True once the closing ']' of a JSON array has been read."""
+        return self._format == "array" and self._expect == "done"
+
+    def reopen_array(self):
+        """Continue a JSON array after its closing ']'.
+
+        For trajectories that are rewritten with new events inserted before
+        the ']': feed the text from the end of the last event onwards again,
+        e.g. ', {...}]'.
+        """
+        if not self.closed:
+            raise ValueError("Only a closed JSON array can be reopened.")
+        self._expect = self._expect_before_close
+        self._chunks = []
+        self._buffered = 0
+        self._buffer = ""
+        self._pos = 0
+        self._wait_for = 0
+
+    def _decode_next(self, events, final):
+        """Decode one token from the buffer. Returns False when more data is needed."""
+        buffer = self._buffer
+        pos = WHITESPACE.match(buffer, self._pos).end()
+        self._pos = pos
+        if pos == len(buffer):
+            return False
+
+        if self._format is None:
+            self._format = "array" if buffer[pos] == "[" else "lines"
+            if self._format == "array":
+                self._pos = pos + 1
+            return True
+
+        if self._format == "lines":
+            end = buffer.find("\n", pos)
+            if end == -1:
+                if not final:
+                    self._need_more(len(buffer) - pos)
+                    return False
+                end = len(buffer)
+            line = buffer[pos:end].strip()
+            if line:
+                self._append(events, json.loads(line), pos, pos + len(line))
+            self._pos = end + 1
+            return True
+
+        if self._expect == "done":
+            raise ValueError("Unexpected data after the end of the JSON array.")
+        if self._expect in ("first", "separator"):
+            if buffer[pos] == "]":
+                self._expect_before_close = self._expect
+                self._expect = "done"
+                self._pos = pos + 1
+                return True
+            if self._expect == "separator":
+                if buffer[pos] != ",":
+                    raise ValueError(f"Expected ',' or ']' in JSON array, found {buffer[pos]!r}.")
+                self._expect = "value"
+                self._pos = pos + 1
+                return True
+
+        try:
+            event, end = self._decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            self._need_more(len(buffer) - pos)
+            return False
+        if end == len(buffer) and not final and not isinstance(event, (dict, list, str)):
+            # A number or literal at the end of the buffer may continue in the next chunk
+            self._need_more(len(buffer) - pos)
+            return False
+        self._append(events, event, pos, end)
+        self._expect = "separator"
+        self._pos = end
+        return True
+
+    def _append(self, events, event, start, end):
+        if self._with_spans:
+            events.append((event, self._consumed + start, self._consumed + end))
+        else:
+            events.append(event)
+
+    def _need_more(self, partial_length):
+        # Wait for the partial event to double before decoding it again, so a
+        # large event spread over many chunks is re-scanned only O(log n) times
+        self._wait_for = 2 * partial_length
+
+def iter_events(file_path, chunk_size=CHUNK_SIZE):
+    """Yield the events of a trajectory file (JSON array or JSON Lines) one at a time."""
+    decoder = EventStreamDecoder()
+    with open(file_path, "r", encoding="utf-8") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield from decoder.feed(chunk)
+    yield from decoder.feed("", final=True)
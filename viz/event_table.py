@@ -0,0 +1,108 @@
+import numpy as np
+from process_events import iter_processed_events
+
+# Columns of a processed event table, in the order they are rendered
+TEXT_COLUMNS = ("id", "timestamp", "source", "message")
+TOKEN_COLUMNS = ("cache_read_tokens", "cache_creation_tokens", "completion_tokens")
+COST_COLUMNS = ("cache_read_cost", "cache_creation_cost", "completion_cost", "event_cost", "total_cost")
+ROW_KEYS = TEXT_COLUMNS + ("subt",) + TOKEN_COLUMNS + COST_COLUMNS + ("special",)
+
+# Columns summed per type by group_sums
+SUMMED_COLUMNS = ("cache_creation_tokens", "completion_tokens",
+                  "cache_creation_cost", "completion_cost", "event_cost")
+
+class EventTable:
+    """Processed event rows stored column-wise in NumPy arrays.
+
+    Token columns are int64, cost columns float64 and text columns fixed
+    width unicode. 'subt' is stored as int32 codes into `subt_categories`,
+    in order of first appearance. Costs stay numeric until they are
+    formatted for display by `format_rows`.
+    """
+
+    def __init__(self, columns, subt_categories):
+        self.columns = columns
+        self.subt_categories = subt_categories
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a table from processed event rows (dicts as yielded by iter_processed_events)."""
+        values = {name: [] for name in ROW_KEYS}
+        for row in rows:
+            for name in ROW_KEYS:
+                values[name].append(row[name])
+
+        subt_categories = {}
+        subt_codes = [subt_categories.setdefault(subt, len(subt_categories)) for subt in values["subt"]]
+
+        columns = {name: np.array([str(value) for value in values[name]], dtype=str)
+                   for name in TEXT_COLUMNS + ("special",)}
+        columns.update({name: np.array(values[name], dtype=np.int64) for name in TOKEN_COLUMNS})
+        columns.update({name: np.array(values[name], dtype=np.float64) for name in COST_COLUMNS})
+        columns["subt_code"] = np.array(subt_codes, dtype=np.int32)
+        return cls(columns, list(subt_categories))
+
+    def __len__(self):
+        return len(self.columns["subt_code"])
+
+    def __getitem__(self, name):
+        if name == "subt":
+            return np.array(self.subt_categories, dtype=str)[self.columns["subt_code"]]
+        return self.columns[name]
+
+    def take(self, indices):
+        """Return a new table with the rows at `indices`, in that order."""
+        return EventTable({name: column[indices] for name, column in self.columns.items()},
+                          self.subt_categories)
+
+    def sorted_by(self, name, descending=False):
+        """Return a new table sorted by a numeric column. Ties keep their order."""
+        column = self.columns[name]
+        return self.take(np.argsort(-column if descending else column, kind="stable"))
+
+    def group_sums(self):
+        """Sum the SUMMED_COLUMNS per 'subt', skipping rows with a 'special' note.
+
+        Returns a dict of subt -> {"count": ..., "sum_<column>": ...} in order
+        of each type's first non-special row.
+        """
+        keep = self.columns["special"] == ""
+        codes = self.columns["subt_code"][keep]
+        present, first_index = np.unique(codes, return_index=True)
+        present = present[np.argsort(first_index, kind="stable")]
+
+        size = len(self.subt_categories)
+        counts = np.bincount(codes, minlength=size)
+        sums = {name: np.bincount(codes, weights=self.columns[name][keep], minlength=size)
+                for name in SUMMED_COLUMNS}
+
+        grouped_data = {}
+        for code in present:
+            group = {"count": int(counts[code])}
+            for name in SUMMED_COLUMNS:
+                total = sums[name][code]
+                group[f"sum_{name}"] = int(round(total)) if name in TOKEN_COLUMNS else float(total)
+            grouped_data[self.subt_categories[code]] = group
+        return grouped_data
+
+    def format_rows(self):
+        """Yield every row as a list of display strings, in ROW_KEYS order."""
+        subts = self.subt_categories
+        columns = [self.columns[name] for name in TEXT_COLUMNS]
+        tokens = [self.columns[name] for name in TOKEN_COLUMNS]
+        costs = [self.columns[name] for name in COST_COLUMNS]
+        codes = self.columns["subt_code"]
+        special = self.columns["special"]
+        for i in range(len(self)):
+            yield ([str(column[i]) for column in columns]
+                   + [subts[codes[i]]]
+                   + [str(column[i]) for column in tokens]
+                   + [f"${column[i]:.2f}" for column in costs]
+                   + [str(special[i])])
+
+def build_event_table(data, attribution="window"):
+    """Process events (a list, stream or records) straight into an EventTable.
+
+    `attribution` is one of process_events.ATTRIBUTIONS.
+    """
+    return EventTable.from_rows(iter_processed_events(data, attribution))
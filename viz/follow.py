@@ -0,0 +1,236 @@
+import argparse
+import codecs
+import os
+import tempfile
+import time
+import webbrowser
+from datetime import datetime
+from event_stream import EventStreamDecoder, CHUNK_SIZE
+from event_table import SUMMED_COLUMNS, TOKEN_COLUMNS
+from process_events import EventProcessor, NextLlmUsageWindow, iter_records
+from usage import UsageNormalizer
+from by_type import HEADERS, format_summary_row, summary_rows_from_sums
+from html_writer import HtmlTableWriter, STICKY_TABLE_STYLE
+
+# Bytes at the start of the file compared on every poll to notice that it was replaced
+FINGERPRINT_SIZE = 4096
+
+class TrajectoryTail:
+    """Read the events added to a growing trajectory file since the last poll.
+
+    Keeps the byte offset read so far and the decoder state between polls,
+    so each poll reads only the new bytes. JSON Lines files are appended to;
+    JSON array files are usually rewritten with new events inserted before
+    the closing ']', so once the array is closed the next poll resumes right
+    after the last event. If the start of the file changes or it shrinks, the
+    file was replaced and is read again from the beginning.
+    """
+
+    def __init__(self, file_path, chunk_size=CHUNK_SIZE):
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.reset()
+
+    def reset(self):
+        self.decoder = EventStreamDecoder()
+        self.utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.offset = 0  # Bytes fed to the decoder
+        self.resume_offset = None  # Where to continue a closed JSON array: just after its last event
+        self.fingerprint = b""
+        self.stat = None
+
+    def consumed_offset(self):
+        """Byte offset up to which the decoder has consumed complete events."""
+        pending = self.decoder.pending_text().encode("utf-8")
+        return self.offset - len(pending) - len(self.utf8.getstate()[0])
+
+    def poll(self):
+        """Return (events, restarted): the new events, and whether the file was
+        replaced so that `events` start again from the first event."""
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            return [], False
+        if self.stat is not None and (stat.st_size, stat.st_mtime_ns) == self.stat:
+            return [], False
+        self.stat = (stat.st_size, stat.st_mtime_ns)
+        size = stat.st_size
+
+        with open(self.file_path, "rb") as f:
+            # Only the bytes before the resume point must stay the same
+            known = self.resume_offset if self.resume_offset is not None else self.consumed_offset()
+            head = f.read(FINGERPRINT_SIZE)
+            compared = min(known, len(self.fingerprint))
+            restarted = size < known or head[:compared] != self.fingerprint[:compared]
+            if restarted:
+                self.reset()
+                self.stat = (stat.st_size, stat.st_mtime_ns)
+            self.fingerprint = head
+
+            if self.resume_offset is not None:
+                self.decoder.reopen_array()
+                self.utf8.reset()
+                self.offset = self.resume_offset
+                self.resume_offset = None
+            elif size == self.offset:
+                return [], restarted
+
+            events = []
+            f.seek(self.offset)
+            try:
+                for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                    self.offset += len(chunk)
+                    events.extend(self.decoder.feed(self.utf8.decode(chunk)))
+                events.extend(self.decoder.drain())
+            except ValueError:
+                # Caught the file in the middle of a rewrite; read it all again next time
+                self.reset()
+                return [], True
+
+            if self.decoder.closed:
+                self.resume_offset = self._find_resume_offset(f)
+        return events, restarted
+
+    def _find_resume_offset(self, f):
+        # Skip back over the whitespace, the ']' and the whitespace before it
+        end = self.consumed_offset()
+        start = max(0, end - FINGERPRINT_SIZE)
+        f.seek(start)
+        text = f.read(end - start).rstrip(b" \t\r\n")
+        return start + len(text[:-1].rstrip(b" \t\r\n"))
+
+    def finish(self):
+        """Return the events of a last line that has no newline yet (JSON Lines)."""
+        if self.decoder.closed:
+            return []
+        try:
+            return self.decoder.feed(self.utf8.decode(b"", final=True), final=True)
+        except ValueError:
+            return []
+
+class RunningSummary:
+    """Per-type sums of processed events, updated as events arrive.
+
+    Events go through the same look-ahead window and processing as
+    process_events, and the sums match EventTable.group_sums for the events
+    seen so far. An event is only counted once its next LLM call is known
+    (or its window closed), so the most recent events may still be pending.
+    """
+
+    def __init__(self):
+        self.normalizer = UsageNormalizer()
+        self.window = NextLlmUsageWindow()
+        self.processor = EventProcessor()
+        self.grouped_data = {}
+        self.event_count = 0
+        self.row_count = 0
+        self.total_cost = 0.0
+
+    def add_events(self, events):
+        """Add new events (raw events or EventRecords) in order."""
+        for record in iter_records(events, self.normalizer):
+            self.event_count += 1
+            for resolved, next_llm_usage in self.window.push(record):
+                self._add(resolved, next_llm_usage)
+
+    def finish(self):
+        """Count the pending events as if their windows had closed."""
+        for record, next_llm_usage in self.window.finish():
+            self._add(record, next_llm_usage)
+
+    def _add(self, record, next_llm_usage):
+        row = self.processor.process(record, next_llm_usage)
+        if row is None:
+            return
+        self.row_count += 1
+        self.total_cost += row["total_cost"]
+        if row["special"]:
+            return  # Left out of the per-type sums, like in group_sums
+        group = self.grouped_data.get(row["subt"])
+        if group is None:
+            group = self.grouped_data[row["subt"]] = {"count": 0}
+            for name in SUMMED_COLUMNS:
+                group[f"sum_{name}"] = 0 if name in TOKEN_COLUMNS else 0.0
+        group["count"] += 1
+        for name in SUMMED_COLUMNS:
+            group[f"sum_{name}"] += row[name]
+
+    @property
+    def pending_count(self):
+        return len(self.window)
+
+    def summary_rows(self):
+        return summary_rows_from_sums(self.grouped_data)
+
+    def status(self):
+        return (f"{self.event_count} events, {self.row_count} processed, "
+                f"{self.pending_count} pending, total cost ${self.total_cost:.2f}")
+
+def write_live_summary(summary, filename="by_type_live.html", refresh_seconds=None):
+    """Write the by-type summary of a RunningSummary to output/<filename> and return its path.
+
+    The page is written to a temporary file and renamed into place, so a
+    browser never sees it half written. With `refresh_seconds` it reloads itself.
+    """
+    output_dir = "output"
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, filename)
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        with HtmlTableWriter(filename, "Summary by Type (live)", HEADERS,
+                             style=STICKY_TABLE_STYLE, stream=f) as writer:
+            writer.footer = f"<p>{summary.status()}, updated {datetime.now():%H:%M:%S}</p>"
+            if refresh_seconds:
+                writer.footer += f"<script>setTimeout(() => location.reload(), {int(refresh_seconds * 1000)});</script>"
+            writer.write_rows(format_summary_row(row) for row in summary.summary_rows())
+    os.replace(tmp_path, output_file)
+    return output_file
+
+def follow(file_path, interval=2.0, filename="by_type_live.html", open_browser=True, once=False):
+    """Keep the by-type summary of a growing trajectory up to date until interrupted."""
+    tail = TrajectoryTail(file_path)
+    summary = RunningSummary()
+    opened = False
+    while True:
+        start = time.perf_counter()
+        events, restarted = tail.poll()
+        if restarted:
+            summary = RunningSummary()
+        if once:
+            events += tail.finish()
+        summary.add_events(events)
+        if once:
+            summary.finish()
+
+        if events or restarted or not opened:
+            output_file = write_live_summary(summary, filename, None if once else interval)
+            elapsed = time.perf_counter() - start
+            print(f"[{datetime.now():%H:%M:%S}] +{len(events)} events in {elapsed * 1000:.1f} ms: "
+                  f"{summary.status()}" + (" (file was replaced, started over)" if restarted else ""))
+            if open_browser and not opened:
+                webbrowser.open(output_file)
+            opened = True
+        if once:
+            return summary
+        time.sleep(interval)
+
+def main():
+    parser = argparse.ArgumentParser(description="Follow a growing trajectory and keep its summary by type up to date.")
+    parser.add_argument("file", help="Trajectory file (JSON array or JSON Lines)")
+    parser.add_argument("--interval", type=float, default=2.0,
+                        help="Seconds between checks for new events (default: 2)")
+    parser.add_argument("--output", default="by_type_live.html",
+                        help="Name of the report written to output/ (default: by_type_live.html)")
+    parser.add_argument("--no-browser", action="store_true",
+                        help="Only write the report, don't open it in a browser")
+    parser.add_argument("--once", action="store_true",
+                        help="Read the file once, write the report and exit")
+    args = parser.parse_args()
+
+    try:
+        follow(args.file, args.interval, args.output, not args.no_browser, args.once)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
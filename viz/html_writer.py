@@ -0,0 +1,439 @@
+import json
+import os
+from html import escape
+from urllib.parse import quote
+from profiling import timed_writes, finish_timed_writes
+
+# How table reports are laid out: one static table, a virtual-scrolling
+# table fed from a JSON blob, or static pages with an index
+LAYOUTS = ("table", "virtual", "pages")
+DEFAULT_LAYOUT = os.environ.get("VIZ_TABLE_LAYOUT", "table")
+
+# Rows per page file in the "pages" layout
+ROWS_PER_PAGE = 5000
+
+# Whether finished reports are opened in the browser, unless a writer is told otherwise
+OPEN_BROWSER = True
+
+# Style of the plain report tables
+TABLE_STYLE = """
+            table {
+                width: 100%;
+                border-collapse: collapse;
+            }
+            th, td {
+                border: 1px solid black;
+                padding: 8px;
+                text-align: left;
+            }
+            th {
+                background-color: #f2f2f2;
+            }
+"""
+
+# Style of the long report tables, whose header stays visible while scrolling
+STICKY_TABLE_STYLE = """
+            table {
+                width: 100%;
+                border-collapse: collapse;
+                table-layout: auto;
+            }
+            th, td {
+                border: 1px solid black;
+                padding: 8px;
+                text-align: left;
+                width: auto; /* Allow columns to autofit content */
+            }
+            th {
+                background-color: #f2f2f2;
+                position: sticky;
+                top: 0;
+                z-index: 1;
+            }
+"""
+
+class RawHtml(str):
+    """A cell value that is already HTML and must not be escaped."""
+
+def html_cell(cell):
+    return cell if isinstance(cell, RawHtml) else escape(str(cell))
+
+def link_cell(cell, template):
+    """A cell linking to `template` with "{id}" replaced by the cell's value."""
+    value = str(cell)
+    return RawHtml(f'<a href="{escape(template.replace("{id}", quote(value, safe="")))}">{escape(value)}</a>')
+
+class HtmlTableWriter:
+    """Write an HTML table report row by row, straight to its output file.
+
+    Use it as a context manager: the page head and table header are written
+    on entry, every `write_row` call appends one escaped row, and the page
+    is closed (and opened in the browser) on exit. Only one row is held in
+    memory at a time, however long the report is.
+
+    Pass `stream` to write into an open text stream instead of output/<filename>.
+    `links` maps column indexes to URL templates; the cells of those columns
+    link to the template with "{id}" replaced by the cell's value.
+    """
+
+    def __init__(self, filename, title, headers, style=TABLE_STYLE, heading=None,
+                 open_browser=None, stream=None, links=None):
+        self.filename = filename
+        self.title = title
+        self.headers = headers
+        self.style = style
+        self.heading = heading if heading is not None else title
+        self.open_browser = (OPEN_BROWSER if open_browser is None else open_browser) and stream is None
+        self.output_file = None
+        self.footer = ""  # HTML written after the table
+        self.links = links or {}
+        self._stream = stream
+        self._file = None
+        self.row_count = 0
+
+    def __enter__(self):
+        if self._stream is None:
+            output_dir = "output"
+            os.makedirs(output_dir, exist_ok=True)
+            self.output_file = os.path.join(output_dir, self.filename)
+            self._file = open(self.output_file, "w", encoding="utf-8")
+            self._stream = self._file
+        # While profiling, the time of the writes is its own stage, apart from building the rows
+        self._stream = timed_writes(self._stream, "html: write")
+        self._stream.write(self.page_head())
+        return self
+
+    def page_head(self):
+        """The HTML up to and including the opening <tbody>."""
+        header_cells = "".join(f"<th>{escape(header)}</th>" for header in self.headers)
+        return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{escape(self.title)}</title>
+    <style>{self.style}    </style>
+</head>
+<body>
+    <h1>{escape(self.heading)}</h1>
+    <table>
+        <thead>
+            <tr>{header_cells}</tr>
+        </thead>
+        <tbody>
+"""
+
+    def page_tail(self):
+        """The HTML from the closing </tbody> to the end of the page."""
+        return f"""        </tbody>
+    </table>
+    {self.footer}
+</body>
+</html>
+"""
+
+    def write_row(self, cells):
+        """Append one table row; every cell is converted to a string and HTML-escaped."""
+        if self.links:
+            cells = [link_cell(cell, self.links[i]) if i in self.links else cell for i, cell in enumerate(cells)]
+        self._stream.write("<tr>" + "".join(f"<td>{html_cell(cell)}</td>" for cell in cells) + "</tr>\n")
+        self.row_count += 1
+
+    def write_rows(self, rows):
+        for cells in rows:
+            self.write_row(cells)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self._stream.write(self.page_tail())
+        if self._file is not None:
+            self._stream.close()  # The file, or its TimedWrites
+        finish_timed_writes(self._stream)
+        if exc_type is None and self.open_browser:
+            import webbrowser
+            webbrowser.open(self.output_file)
+        return False
+
+# Client side of the "virtual" layout: renders only the rows in view, and
+# sorts (click a header) and filters (search box) without re-running the report
+VIRTUAL_TABLE_SCRIPT = """
+(function () {
+    const rows = JSON.parse(document.getElementById("rows").textContent);
+    const viewport = document.getElementById("viewport");
+    const body = document.getElementById("body");
+    const filter = document.getElementById("filter");
+    const count = document.getElementById("count");
+    const headers = Array.from(document.querySelectorAll("thead th"));
+    const columns = headers.length;
+    const links = JSON.parse(document.getElementById("links").textContent);
+    // Row height in px until a row is measured, and when one measures 0 (e.g. in a hidden tab)
+    const FALLBACK_ROW_HEIGHT = 34;
+    let rowHeight = 0;
+    let view = [];
+    let sortColumn = -1;
+    let sortDescending = false;
+
+    function escapeHtml(value) {
+        return value.replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;").replace(/"/g, "&quot;");
+    }
+
+    function renderCell(value, column) {
+        const template = links[column];
+        if (!template) {
+            return escapeHtml(value);
+        }
+        const href = template.replace("{id}", encodeURIComponent(value));
+        return `<a href="${escapeHtml(href)}">${escapeHtml(value)}</a>`;
+    }
+
+    function numeric(value) {
+        const match = /^\\$?(-?\\d+(\\.\\d+)?(e-?\\d+)?)$/.exec(value);
+        return match ? parseFloat(match[1]) : null;
+    }
+
+    function compare(a, b) {
+        const x = numeric(a), y = numeric(b);
+        if (x !== null && y !== null) {
+            return x - y;
+        }
+        return a < b ? -1 : a > b ? 1 : 0;
+    }
+
+    function spacer(height) {
+        return `<tr class="spacer"><td colspan="${columns}" style="height:${height}px"></td></tr>`;
+    }
+
+    function render() {
+        const height = rowHeight || FALLBACK_ROW_HEIGHT;
+        const first = Math.max(0, Math.floor(viewport.scrollTop / height) - 20);
+        const last = Math.min(view.length, first + Math.ceil(viewport.clientHeight / height) + 40);
+        const html = [spacer(first * height)];
+        for (let k = first; k < last; k++) {
+            html.push("<tr>" + rows[view[k]].map((cell, column) => "<td>" + renderCell(cell, column) + "</td>").join("") + "</tr>");
+        }
+        html.push(spacer((view.length - last) * height));
+        body.innerHTML = html.join("");
+        if (!rowHeight && last > first) {
+            // Measure the real row height once, then lay out again with it
+            const measured = body.rows[1].getBoundingClientRect().height;
+            rowHeight = measured > 0 ? measured : FALLBACK_ROW_HEIGHT;
+            render();
+        }
+    }
+
+    function update() {
+        const query = filter.value.toLowerCase();
+        view = [];
+        for (let i = 0; i < rows.length; i++) {
+            if (!query || rows[i].some(cell => cell.toLowerCase().includes(query))) {
+                view.push(i);
+            }
+        }
+        if (sortColumn >= 0) {
+            view.sort((a, b) => {
+                const order = compare(rows[a][sortColumn], rows[b][sortColumn]);
+                return (sortDescending ? -order : order) || a - b;
+            });
+        }
+        headers.forEach((header, i) => {
+            header.dataset.sort = i === sortColumn ? (sortDescending ? "desc" : "asc") : "";
+        });
+        count.textContent = `${view.length} of ${rows.length} rows`;
+        render();
+    }
+
+    headers.forEach((header, i) => header.addEventListener("click", () => {
+        sortDescending = sortColumn === i ? !sortDescending : false;
+        sortColumn = i;
+        update();
+    }));
+    filter.addEventListener("input", update);
+    let pending = false;
+    viewport.addEventListener("scroll", () => {
+        if (!pending) {
+            pending = true;
+            requestAnimationFrame(() => { pending = false; render(); });
+        }
+    });
+    window.addEventListener("resize", render);
+    update();
+})();
+"""
+
+# Extra style of the "virtual" layout: rows have a fixed height so the
+# scroll position maps directly to a row number
+VIRTUAL_TABLE_STYLE = """
+            #viewport {
+                height: 80vh;
+                overflow: auto;
+            }
+            tbody td {
+                white-space: nowrap;
+                overflow: hidden;
+                text-overflow: ellipsis;
+                max-width: 40ch;
+            }
+            tr.spacer td {
+                padding: 0;
+                border: 0;
+            }
+            th {
+                cursor: pointer;
+            }
+            th[data-sort="asc"]::after {
+                content: " \\25B2";
+            }
+            th[data-sort="desc"]::after {
+                content: " \\25BC";
+            }
+"""
+
+class VirtualTableWriter(HtmlTableWriter):
+    """Write a table report as a compact JSON blob plus a virtual-scrolling table.
+
+    Rows are streamed into a JSON array embedded in the page; the browser
+    only ever builds the few rows in view, so very long reports open
+    quickly, and sorting and filtering happen client-side.
+    """
+
+    def page_head(self):
+        header_cells = "".join(f"<th>{escape(header)}</th>" for header in self.headers)
+        return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{escape(self.title)}</title>
+    <style>{STICKY_TABLE_STYLE}{VIRTUAL_TABLE_STYLE}    </style>
+</head>
+<body>
+    <h1>{escape(self.heading)}</h1>
+    <p><input id="filter" type="search" placeholder="Filter rows"> <span id="count"></span></p>
+    <div id="viewport">
+        <table>
+            <thead>
+                <tr>{header_cells}</tr>
+            </thead>
+            <tbody id="body"></tbody>
+        </table>
+    </div>
+    <script id="links" type="application/json">{self._links_json()}</script>
+    <script id="rows" type="application/json">[
+"""
+
+    def page_tail(self):
+        return f"""]</script>
+    <script>{VIRTUAL_TABLE_SCRIPT}</script>
+    {self.footer}
+</body>
+</html>
+"""
+
+    def _links_json(self):
+        return json.dumps({str(column): template for column, template in self.links.items()}).replace("<", "\\u003c")
+
+    def write_row(self, cells):
+        # "<" is escaped so a cell can't close the <script> element
+        row = json.dumps([str(cell) for cell in cells], ensure_ascii=False).replace("<", "\\u003c")
+        self._stream.write(row if self.row_count == 0 else ",\n" + row)
+        self.row_count += 1
+
+class PagedTableWriter:
+    """Write a table report as numbered page files plus an index page.
+
+    output/<filename> lists the pages; the pages themselves go to
+    output/<name>/page-NNNN.html with `rows_per_page` rows each and links to
+    the previous and next page. Rows are streamed, one page file at a time.
+    """
+
+    def __init__(self, filename, title, headers, style=TABLE_STYLE, heading=None,
+                 open_browser=None, rows_per_page=ROWS_PER_PAGE, links=None):
+        self.filename = filename
+        self.title = title
+        self.headers = headers
+        self.style = style
+        self.heading = heading if heading is not None else title
+        self.open_browser = open_browser
+        self.rows_per_page = rows_per_page
+        self.links = links
+        self.page_dir = os.path.splitext(filename)[0]
+        self.output_file = None
+        self.row_count = 0
+        self._pages = []  # (page file name, row count, first cell of the first and last row)
+        self._page = None
+
+    def __enter__(self):
+        os.makedirs(os.path.join("output", self.page_dir), exist_ok=True)
+        return self
+
+    def _page_name(self, number):
+        return f"page-{number:04d}.html"
+
+    def _open_page(self):
+        number = len(self._pages) + 1
+        name = self._page_name(number)
+        self._pages.append([name, 0, None, None])
+        self._page = HtmlTableWriter(
+            os.path.join(self.page_dir, name), f"{self.title} (page {number})", self.headers,
+            style=self.style, heading=f"{self.heading} (page {number})", open_browser=False, links=self.links)
+        self._page.__enter__()
+
+    def _close_page(self, has_next):
+        number = len(self._pages)
+        links = [f'<a href="../{escape(self.filename)}">Index</a>']
+        if number > 1:
+            links.insert(0, f'<a href="{self._page_name(number - 1)}">Previous</a>')
+        if has_next:
+            links.append(f'<a href="{self._page_name(number + 1)}">Next</a>')
+        self._page.footer = "<p>" + " | ".join(links) + "</p>"
+        self._page.__exit__(None, None, None)
+        self._page = None
+
+    def write_row(self, cells):
+        if self._page is not None and self._page.row_count >= self.rows_per_page:
+            self._close_page(has_next=True)
+        if self._page is None:
+            self._open_page()
+        self._page.write_row(cells)
+        page = self._pages[-1]
+        page[1] += 1
+        first_cell = cells[0] if len(cells) else ""
+        if page[2] is None:
+            page[2] = first_cell
+        page[3] = first_cell
+        self.row_count += 1
+
+    def write_rows(self, rows):
+        for cells in rows:
+            self.write_row(cells)
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._page is not None:
+            self._close_page(has_next=False)
+        if exc_type is not None:
+            return False
+
+        first_header = self.headers[0] if self.headers else ""
+        index = HtmlTableWriter(
+            self.filename, self.title, ["Page", "Rows", f"First {first_header}", f"Last {first_header}"],
+            heading=f"{self.heading} ({self.row_count} rows in {len(self._pages)} pages)",
+            open_browser=self.open_browser)
+        with index:
+            for number, (name, rows, first, last) in enumerate(self._pages, start=1):
+                link = RawHtml(f'<a href="{escape(self.page_dir)}/{name}">Page {number}</a>')
+                index.write_row((link, rows, "" if first is None else first, "" if last is None else last))
+        self.output_file = index.output_file
+        return False
+
+def open_table_writer(filename, title, headers, layout=None, **kwargs):
+    """Return the table writer for `layout` (one of LAYOUTS, default DEFAULT_LAYOUT)."""
+    layout = layout or DEFAULT_LAYOUT
+    if layout == "table":
+        return HtmlTableWriter(filename, title, headers, **kwargs)
+    if layout == "virtual":
+        return VirtualTableWriter(filename, title, headers, **kwargs)
+    if layout == "pages":
+        if kwargs.pop("stream", None) is not None:
+            raise ValueError("The 'pages' layout writes several files and can't write into a stream.")
+        return PagedTableWriter(filename, title, headers, **kwargs)
+    raise ValueError(f"Unknown table layout {layout!r}, expected one of {', '.join(LAYOUTS)}.")
@@ -1,97 +1,41 @@
-from common import select_and_load_json, COST_PER_CACHE_WRITE_TOKEN, save_and_open_html
-import webbrowser
-import os
+from common import select_and_stream_json, COST_PER_CACHE_WRITE_TOKEN
+from html_writer import HtmlTableWriter
+from process_events import iter_records
 
-def visualize(data=None):
-    """Visualize input cost data."""
+HEADERS = ["ID", "Timestamp", "Source", "Observation", "Message", "Cache Creation Tokens", "Cache Creation Cost"]
 
-    # Prepare data for the table
+def visualize(data=None, stream=None):
+    """Visualize input cost data, into `stream` if given instead of a file."""
+
+    # Prepare data for the table: the first observation of each LLM call
     table_rows = []
-    for event in data:
-        obs = event.get("observation", None)
-        new_input_tokens = event.get("tool_call_metadata", {})\
-            .get("model_response", {})\
-            .get("usage", {}).get("cache_creation_input_tokens")
-        if obs is not None and new_input_tokens is not None:  # Include cache creation tokens
-            message = event.get("message", "")
-            args = event.get("args", {})
-            if "path" in args:
-                message += f" (Path: {args['path']})"
-            if "command" in args:
-                message += f" (Command: {args['command']})"
-            cache_creation_cost = new_input_tokens * COST_PER_CACHE_WRITE_TOKEN
+    listed = set()  # Model responses already listed
+    for record in iter_records(data):
+        obs = record.observation
+        call = record.llm_usage
+        if obs is not None and call and record.response_id not in listed:
+            if record.response_id:
+                listed.add(record.response_id)
+            new_input_tokens = call["cache_write_tokens"]
             table_rows.append((
-                event.get("id", ""),
-                event.get("timestamp", ""),
-                event.get("source", ""),
+                record.id,
+                record.timestamp,
+                record.source,
                 obs,
-                message[:60],
+                record.message[:60],
                 new_input_tokens,
-                f"${cache_creation_cost:.6f}"
             ))
 
     # Sort rows by input tokens in descending order
     table_rows.sort(key=lambda x: x[5], reverse=True)
 
-    # Generate HTML rows dynamically based on the length of each row
-    html_rows = [
-        f"""
-        <tr>
-            {''.join(f'<td>{cell}</td>' for cell in row)}
-        </tr>
-        """
-        for row in table_rows
-    ]
-
-    # Generate HTML content
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Input Cost Visualizer</title>
-        <style>
-            table {{
-                width: 100%;
-                border-collapse: collapse;
-            }}
-            th, td {{
-                border: 1px solid black;
-                padding: 8px;
-                text-align: left;
-            }}
-            th {{
-                background-color: #f2f2f2;
-            }}
-        </style>
-    </head>
-    <body>
-        <h1>Input Cost Visualizer</h1>
-        <table>
-            <thead>
-                <tr>
-                    <th>ID</th>
-                    <th>Timestamp</th>
-                    <th>Source</th>
-                    <th>Observation</th>
-                    <th>Message</th>
-                    <th>Cache Creation Tokens</th>
-                    <th>Cache Creation Cost</th>
-                </tr>
-            </thead>
-            <tbody>
-                {''.join(html_rows)}
-            </tbody>
-        </table>
-    </body>
-    </html>
-    """
-
-    # Save and open the HTML file
-    save_and_open_html(html_content, "input_cost.html")
+    # Write the report, formatting the cost as each row is written
+    with HtmlTableWriter("input_cost.html", "Input Cost Visualizer", HEADERS, stream=stream) as writer:
+        for row in table_rows:
+            cache_creation_cost = row[5] * COST_PER_CACHE_WRITE_TOKEN
+            writer.write_row(row + (f"${cache_creation_cost:.6f}",))
 
 if __name__ == "__main__":
     # Load the selected JSON file
-    data = select_and_load_json()
+    data = select_and_stream_json()
     visualize(data)
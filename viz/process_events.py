@@ -1,64 +1,212 @@
+from bisect import bisect_right
+from collections import deque
 from datetime import datetime, timedelta
+from itertools import islice
 from common import COST_PER_CACHE_WRITE_TOKEN, COST_PER_CACHE_READ_TOKEN, COST_PER_COMPLETION_TOKEN
+from usage import UsageNormalizer
+from causality import CausalityIndex
 
-def extract_llm_usage(event):
-    """Extract LLM usage object from an event."""
-    llm_usage = (event
-        .get("tool_call_metadata", {}).get("model_response", {}).get("usage", {}))
-    if llm_usage == {}:
-        llm_usage = event.get("llm_metrics", {}).get("accumulated_token_usage", {})
-    return llm_usage
+# How far ahead we look for the LLM call that consumed an event
+NEXT_LLM_USAGE_WINDOW = timedelta(minutes=5)
 
-def process_events(data):
-    """Process events and return a list of processed event objects."""
-    table_rows = []
-    previous_event_with_llm_usage = None
+# How processed events are matched with LLM calls:
+# - "window": the next LLM call within NEXT_LLM_USAGE_WINDOW by timestamp; works on streams
+# - "exact": the call that produced the causing action and the next call after the event
+ATTRIBUTIONS = ("window", "exact")
+
+# Events whose usage is normalized together when records are extracted from a stream
+RECORD_BATCH_SIZE = 4096
+
+def parse_timestamp(event):
+    """Parse the event timestamp, or return None if the event has none."""
+    timestamp = event.get("timestamp", "")
+    return datetime.fromisoformat(timestamp) if timestamp else None
+
+def build_message(event):
+    """Return the event message with the path or command it acts on appended."""
+    message = event.get("message", "")
+    args = event.get("args", {})
+    if "path" in args:
+        message += f" (Path: {args['path']})"
+    if "command" in args:
+        message += f" (Command: {args['command']})"
+    return message
+
+class EventRecord:
+    """The fields of an event the visualizers use, extracted once."""
+
+    __slots__ = ("id", "timestamp", "time", "source", "message", "action", "observation",
+                 "event_type", "subt", "cause", "usage", "response_id", "accumulated_usage",
+                 "llm_usage", "call_usage")
+
+    def __init__(self, event):
+        self.id = event.get("id", "")
+        self.timestamp = event.get("timestamp", "")
+        self.time = parse_timestamp(event)
+        self.source = event.get("source", "")
+        self.message = build_message(event)
+        self.action = event.get("action", "")
+        self.observation = event.get("observation")
+        self.event_type = "observation" if "observation" in event else "action"
+        self.subt = event.get("observation", event.get("action"))  # None if neither is set
+        self.cause = event.get("cause")
+        # Per-call usage reported with the model response, as reported
+        model_response = event.get("tool_call_metadata", {}).get("model_response") or {}
+        self.usage = model_response.get("usage") or {}
+        self.response_id = model_response.get("id")
+        # Running totals reported by the agent's metrics, as reported
+        self.accumulated_usage = event.get("llm_metrics", {}).get("accumulated_token_usage", {})
+        # Normalized per-call usage, set by usage.UsageNormalizer
+        self.llm_usage = {}
+        self.call_usage = {}
+
+def iter_records(data, normalizer=None):
+    """Yield an EventRecord for every event, reusing records that were already extracted.
+
+    New records get their per-call usage from `normalizer`, in batches; pass
+    the same UsageNormalizer for consecutive parts of one trajectory.
+    """
+    if normalizer is None:
+        normalizer = UsageNormalizer()
+    events = iter(data)
+    while True:
+        batch = list(islice(events, RECORD_BATCH_SIZE))
+        if not batch:
+            return
+        records = [event if isinstance(event, EventRecord) else EventRecord(event) for event in batch]
+        normalizer.normalize([record for record, event in zip(records, batch) if record is not event])
+        yield from records
 
-    for event in data:
+def find_next_llm_usages(timestamps, llm_usages):
+    """For every event, find the usage of the next event within the window that has LLM usage.
 
-        current_timestamp = event.get("timestamp", "")
-        if current_timestamp:
-            current_timestamp = datetime.fromisoformat(current_timestamp)
+    Builds a timestamp index sorted by (timestamp, position) and a reverse
+    "next event with usage" pointer array over it, so each lookup is a single
+    bisect instead of a scan over all events. For chronologically ordered
+    trajectories this picks the same event as a scan in file order.
+    """
+    order = sorted((i for i, ts in enumerate(timestamps) if ts is not None),
+                   key=lambda i: timestamps[i])
+    sorted_timestamps = [timestamps[i] for i in order]
 
-        # Find the next event within 5 minutes with non-empty llm_usage
+    # next_with_usage[k] is the first position >= k in `order` whose event has usage
+    next_with_usage = [len(order)] * (len(order) + 1)
+    for k in range(len(order) - 1, -1, -1):
+        next_with_usage[k] = k if llm_usages[order[k]] != {} else next_with_usage[k + 1]
+
+    next_llm_usages = []
+    for current_timestamp in timestamps:
         next_llm_usage = {}
-        for next_event in data:
-            next_event_timestamp = next_event.get("timestamp", "")
-            if next_event_timestamp:
-                next_event_timestamp = datetime.fromisoformat(next_event_timestamp)
-            if current_timestamp < next_event_timestamp <= current_timestamp + timedelta(minutes=5):
-                next_llm_usage = extract_llm_usage(next_event)
-                if next_llm_usage != {}:
-                    next_llm_usage = extract_llm_usage(next_event)
+        if current_timestamp is not None:
+            # First event strictly after the current one, then the first one with usage
+            k = next_with_usage[bisect_right(sorted_timestamps, current_timestamp)]
+            if k < len(order) and sorted_timestamps[k] <= current_timestamp + NEXT_LLM_USAGE_WINDOW:
+                next_llm_usage = llm_usages[order[k]]
+        next_llm_usages.append(next_llm_usage)
+    return next_llm_usages
+
+class NextLlmUsageWindow:
+    """Match event records pushed one at a time with the usage of their next LLM call.
+
+    Only the events whose look-ahead window is still open are buffered, so
+    memory is bounded by the number of events within the window rather than
+    by the trajectory size. Events are expected in chronological order, as
+    they appear in a trajectory file.
+    """
+
+    def __init__(self):
+        self.pending = deque()  # [record, next_llm_usage or None while unresolved]
+        self.unresolved = deque()  # The pending entries still waiting for their next LLM call
+
+    def push(self, record):
+        """Add the next record and return the (record, next_llm_usage) pairs it resolved, in order."""
+        timestamp = record.time
+        unresolved = self.unresolved
+
+        if timestamp is not None:
+            while unresolved:
+                entry = unresolved[0]
+                if timestamp > entry[0].time + NEXT_LLM_USAGE_WINDOW:
+                    entry[1] = {}  # The window closed without an LLM call
+                elif timestamp > entry[0].time and record.llm_usage != {}:
+                    entry[1] = record.llm_usage
+                else:
                     break
-        llm_usage = extract_llm_usage(event)
+                unresolved.popleft()
+
+        resolved = []
+        pending = self.pending
+        while pending and pending[0][1] is not None:
+            resolved.append(tuple(pending.popleft()))
+
+        # Events without a timestamp never find a next LLM call
+        entry = [record, None if timestamp is not None else {}]
+        pending.append(entry)
+        if timestamp is not None:
+            unresolved.append(entry)
+        return resolved
 
-        cause_event_id = event.get("cause")
-        if ((cause_event_id is not None or event.get("action") == "condensation") 
+    def finish(self):
+        """Return the remaining pairs, treating windows that are still open as closed."""
+        resolved = [(record, next_llm_usage if next_llm_usage is not None else {})
+                    for record, next_llm_usage in self.pending]
+        self.pending.clear()
+        self.unresolved.clear()
+        return resolved
+
+    def __len__(self):
+        return len(self.pending)
+
+def stream_next_llm_usages(records):
+    """Yield (record, next_llm_usage) for a stream of event records (see NextLlmUsageWindow)."""
+    window = NextLlmUsageWindow()
+    for record in records:
+        yield from window.push(record)
+    yield from window.finish()
+
+def iter_next_llm_usages(data):
+    """Yield (record, next_llm_usage) for every event in order."""
+    if not isinstance(data, (list, tuple)):
+        yield from stream_next_llm_usages(iter_records(data))
+        return
+
+    records = list(iter_records(data))
+    next_llm_usages = find_next_llm_usages(
+        [record.time for record in records], [record.llm_usage for record in records])
+    yield from zip(records, next_llm_usages)
+
+class EventProcessor:
+    """Turn (record, next_llm_usage) pairs, in order, into processed event objects."""
+
+    def __init__(self):
+        self.previous_timestamp_with_llm_usage = None
+
+    def process(self, record, next_llm_usage, llm_usage=None):
+        """Return the processed event object, or None if the event didn't feed an LLM call.
+
+        `llm_usage` is the usage of the call that produced the event, by default its own.
+        """
+        current_timestamp = record.time
+        if llm_usage is None:
+            llm_usage = record.llm_usage
+
+        if ((record.cause is not None or record.action == "condensation")
             and next_llm_usage != {} and llm_usage != {}):
             # Check if the previous event with llm_usage exists and is within 5 minutes
             special_note = ""  # Initialize special column
-            if previous_event_with_llm_usage:
-                previous_timestamp = previous_event_with_llm_usage.get("timestamp", "")
-                if previous_timestamp:
-                    previous_timestamp = datetime.fromisoformat(previous_timestamp)
-                    if current_timestamp - previous_timestamp > timedelta(minutes=5):
-                        special_note = "cache miss: outdated"  # Set special note
-
-            # Extract message and other details
-            message = event.get("message", "")
-            args = event.get("args", {})
-            if "path" in args:
-                message += f" (Path: {args['path']})"
-            if "command" in args:
-                message += f" (Command: {args['command']})"
-            subt = event.get("observation", event.get("action", "UNKNOWN-TYPE"))
+            previous_timestamp_with_llm_usage = self.previous_timestamp_with_llm_usage
+            # Exact attribution doesn't need timestamps, so either may be missing
+            if previous_timestamp_with_llm_usage is not None and current_timestamp is not None:
+                if current_timestamp - previous_timestamp_with_llm_usage > timedelta(minutes=5):
+                    special_note = "cache miss: outdated"  # Set special note
+
+            subt = record.subt if record.subt is not None else "UNKNOWN-TYPE"
 
             completion_tokens = llm_usage.get("completion_tokens", 0)
 
             #We only see the input on the next interaction with the AI.
-            cache_read_input_tokens = next_llm_usage.get("cache_read_input_tokens", 0)
-            cache_creation_input_tokens = next_llm_usage.get("cache_creation_input_tokens", 0)
+            cache_read_input_tokens = next_llm_usage.get("cache_read_tokens", 0)
+            cache_creation_input_tokens = next_llm_usage.get("cache_write_tokens", 0)
 
             # Calculate costs
             cache_read_cost = cache_read_input_tokens * COST_PER_CACHE_READ_TOKEN
@@ -67,24 +215,69 @@ def process_events(data):
             event_cost = cache_creation_cost + completion_cost  # Exclude cache-read
             total_cost = event_cost + cache_read_cost  # Include cache-read cost
 
-            table_rows.append({
-                "id": event.get("id", ""),
-                "timestamp": event.get("timestamp", ""),
-                "source": event.get("source", ""),
-                "message": message[:60],
+            row = {
+                "id": record.id,
+                "timestamp": record.timestamp,
+                "source": record.source,
+                "message": record.message[:60],
                 "subt": subt,
                 "cache_read_tokens": cache_read_input_tokens,
                 "cache_creation_tokens": cache_creation_input_tokens,
                 "completion_tokens": completion_tokens,
-                "cache_read_cost": f"${cache_read_cost:.2f}",
-                "cache_creation_cost": f"${cache_creation_cost:.2f}",
-                "completion_cost": f"${completion_cost:.2f}",
-                "event_cost": f"${event_cost:.2f}",
-                "total_cost": f"${total_cost:.2f}",
+                "cache_read_cost": cache_read_cost,
+                "cache_creation_cost": cache_creation_cost,
+                "completion_cost": completion_cost,
+                "event_cost": event_cost,
+                "total_cost": total_cost,
                 "special": special_note
-            })
+            }
+
+            if llm_usage != {} and current_timestamp is not None:
+                self.previous_timestamp_with_llm_usage = current_timestamp
+            return row
+        return None
+
+def iter_exact_usages(data):
+    """Yield (record, next_llm_usage, llm_usage) for every event, attributed by causality.
 
-            if llm_usage != {}:
-                previous_event_with_llm_usage = event
+    An observation is charged the usage of the call that produced the
+    action at the root of its causes, and feeds the first LLM call after it
+    in the trajectory, both looked up in a CausalityIndex in constant time.
+    Events without a cause use their own usage. `data` may also be a
+    CausalityIndex that was already built.
+    """
+    index = data if isinstance(data, CausalityIndex) else CausalityIndex(iter_records(data))
+    for position, record in enumerate(index.records):
+        cause = index.causing_action(record)
+        following = index.following_call(position)
+        yield (record,
+               following.call_usage if following is not None else {},
+               cause.llm_usage if cause is not None else record.llm_usage)
 
-    return table_rows
+def iter_processed_events(data, attribution="window"):
+    """Yield a processed event object for every event that fed an LLM call.
+
+    `data` may be a list of events or any iterable of them, such as the
+    stream returned by `common.select_and_stream_json`. Events that were
+    already extracted into EventRecords are used as they are. Costs are
+    floats in USD; they are formatted when the reports are rendered.
+    `attribution` is one of ATTRIBUTIONS; "exact" reads all events first.
+    """
+    if attribution not in ATTRIBUTIONS:
+        raise ValueError(f"Unknown attribution {attribution!r}, expected one of {ATTRIBUTIONS}")
+    processor = EventProcessor()
+    if attribution == "exact":
+        for record, next_llm_usage, llm_usage in iter_exact_usages(data):
+            row = processor.process(record, next_llm_usage, llm_usage)
+            if row is not None:
+                yield row
+        return
+
+    for record, next_llm_usage in iter_next_llm_usages(data):
+        row = processor.process(record, next_llm_usage)
+        if row is not None:
+            yield row
+
+def process_events(data, attribution="window"):
+    """Process events and return a list of processed event objects."""
+    return list(iter_processed_events(data, attribution))
@@ -0,0 +1,244 @@
+import os
+import re
+import time
+from contextlib import nullcontext
+
+# The active StageProfiler, or None when profiling is off
+_profiler = None
+
+# Returned by stage() when profiling is off, so the hooks only cost a function call
+_NO_STAGE = nullcontext()
+
+def stage(name):
+    """Context manager measuring the stage `name` while profiling is enabled, else a no-op.
+
+    Stages may nest; a stage's self time leaves out its nested stages.
+    """
+    if _profiler is None:
+        return _NO_STAGE
+    return _profiler.stage(name)
+
+def timed_writes(stream, name):
+    """`stream` itself, or while profiling is enabled a TimedWrites counting its writes as the stage `name`."""
+    if _profiler is None:
+        return stream
+    return TimedWrites(_profiler, stream, name)
+
+def finish_timed_writes(stream):
+    """Record the writes to a stream returned by timed_writes, if they were timed."""
+    if isinstance(stream, TimedWrites):
+        stream.finish()
+
+def enable(memory=True, profile_dir=None):
+    """Start profiling the stages; return the StageProfiler collecting the results."""
+    global _profiler
+    _profiler = StageProfiler(memory, profile_dir)
+    _profiler.start()
+    return _profiler
+
+def disable():
+    """Stop profiling and return the StageProfiler that collected the results, if any."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+class StageTotals:
+    """What was measured for all runs of one stage."""
+
+    __slots__ = ("name", "depth", "calls", "seconds", "self_seconds", "peak_bytes", "retained_bytes")
+
+    def __init__(self, name, depth):
+        self.name = name
+        self.depth = depth
+        self.calls = 0
+        self.seconds = 0.0
+        self.self_seconds = 0.0
+        self.peak_bytes = 0  # Highest traced memory above the stage's start
+        self.retained_bytes = 0  # Traced memory still allocated when the stage ended
+
+class _Frame:
+    __slots__ = ("path", "totals", "start", "child_seconds", "start_bytes", "peak_bytes")
+
+class StageProfiler:
+    """Collect wall time and tracemalloc peak memory per stage.
+
+    With `memory` the allocations are traced with tracemalloc, which slows
+    Python code down, so times are inflated; compare them with each other
+    rather than with unprofiled runs. With `profile_dir` every outermost
+    stage is also run under cProfile and its stats are dumped to
+    <profile_dir>/<nn>-<stage>.pstats, for pstats or snakeviz.
+    """
+
+    def __init__(self, memory=True, profile_dir=None):
+        self.memory = memory
+        self.profile_dir = profile_dir
+        self.totals = {}  # (enclosing stage names..., name) -> StageTotals, in order of first run
+        self._stack = []
+        self._dumps = 0
+        self._started_tracemalloc = False
+
+    def start(self):
+        if self.memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+
+    def stop(self):
+        if self._started_tracemalloc:
+            import tracemalloc
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def stage(self, name):
+        return _StageContext(self, name)
+
+    def _totals_for(self, name):
+        path = (self._stack[-1].path if self._stack else ()) + (name,)
+        totals = self.totals.get(path)
+        if totals is None:
+            totals = self.totals[path] = StageTotals(name, len(self._stack))
+        return path, totals
+
+    def add(self, name, seconds):
+        """Record a run of the stage `name` inside the current stage, timed by the caller.
+
+        For work spread over many short calls, like the writes of a report,
+        which would cost more to wrap in stage() one by one. No memory is
+        recorded for it.
+        """
+        _, totals = self._totals_for(name)
+        totals.calls += 1
+        totals.seconds += seconds
+        totals.self_seconds += seconds
+        if self._stack:
+            self._stack[-1].child_seconds += seconds
+
+    def _enter(self, name):
+        path, totals = self._totals_for(name)
+        frame = _Frame()
+        frame.path = path
+        frame.totals = totals
+        frame.child_seconds = 0.0
+        if self.memory:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # The enclosing stage keeps its peak so far; this one starts a new one
+                parent = self._stack[-1]
+                parent.peak_bytes = max(parent.peak_bytes, peak)
+            tracemalloc.reset_peak()
+            frame.start_bytes = current
+            frame.peak_bytes = current
+        self._stack.append(frame)
+        profile = None
+        if self.profile_dir and len(self._stack) == 1:
+            import cProfile
+            profile = cProfile.Profile()
+            profile.enable()
+        frame.start = time.perf_counter()
+        return profile
+
+    def _exit(self, profile):
+        end = time.perf_counter()
+        if profile is not None:
+            profile.disable()
+        frame = self._stack.pop()
+        seconds = end - frame.start
+        totals = frame.totals
+        totals.calls += 1
+        totals.seconds += seconds
+        totals.self_seconds += seconds - frame.child_seconds
+        if self._stack:
+            self._stack[-1].child_seconds += seconds
+        if self.memory:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, frame.peak_bytes)
+            totals.peak_bytes = max(totals.peak_bytes, peak - frame.start_bytes)
+            totals.retained_bytes += current - frame.start_bytes
+            if self._stack:
+                self._stack[-1].peak_bytes = max(self._stack[-1].peak_bytes, peak)
+        if profile is not None:
+            self._dumps += 1
+            safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", totals.name)
+            profile.dump_stats(os.path.join(self.profile_dir, f"{self._dumps:02d}-{safe_name}.pstats"))
+
+    def summary_rows(self):
+        """(stage, calls, total ms, self ms, peak MiB, retained MiB) per stage; memory is None without tracing.
+
+        A stage run inside different enclosing stages has a row under each,
+        and the rows are ordered like a call tree.
+        """
+        rows = []
+        for path in sorted(self.totals, key=self._first_run_order):
+            totals = self.totals[path]
+            peak = totals.peak_bytes / (1 << 20) if self.memory else None
+            retained = totals.retained_bytes / (1 << 20) if self.memory else None
+            rows.append(("  " * totals.depth + totals.name, totals.calls, totals.seconds * 1000,
+                         totals.self_seconds * 1000, peak, retained))
+        return rows
+
+    def _first_run_order(self, path):
+        order = list(self.totals)
+        return [order.index(path[:depth]) for depth in range(1, len(path) + 1)]
+
+    def print_summary(self, file=None):
+        width = max([len(row[0]) for row in self.summary_rows()] + [5])
+        print(f"{'Stage':<{width}} {'Calls':>5} {'Total ms':>10} {'Self ms':>10} {'Peak MiB':>9} {'Kept MiB':>9}",
+              file=file)
+        for name, calls, total, self_ms, peak, retained in self.summary_rows():
+            memory = f"{peak:9.1f} {retained:9.1f}" if peak is not None else f"{'-':>9} {'-':>9}"
+            print(f"{name:<{width}} {calls:>5} {total:10.1f} {self_ms:10.1f} {memory}", file=file)
+        if self.profile_dir:
+            print(f"cProfile stats of each outermost stage are in {self.profile_dir}/", file=file)
+
+class _StageContext:
+    __slots__ = ("profiler", "name", "profile")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profile = self.profiler._enter(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler._exit(self.profile)
+        return False
+
+class TimedWrites:
+    """A text stream adding up the time spent in its write() and close() calls.
+
+    finish() records the total as one run of the stage `name` inside the
+    stage that is current then, and takes it out of that stage's self time.
+    """
+
+    def __init__(self, profiler, stream, name):
+        self.profiler = profiler
+        self.stream = stream
+        self.name = name
+        self.seconds = 0.0
+
+    def write(self, text):
+        start = time.perf_counter()
+        written = self.stream.write(text)
+        self.seconds += time.perf_counter() - start
+        return written
+
+    def close(self):
+        start = time.perf_counter()
+        self.stream.close()
+        self.seconds += time.perf_counter() - start
+
+    def finish(self):
+        self.profiler.add(self.name, self.seconds)
+        self.seconds = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
@@ -0,0 +1,332 @@
+import argparse
+import io
+import json
+import threading
+import webbrowser
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+from analysis import TrajectoryAnalysis
+from event_index import open_event_index
+from follow import TrajectoryTail, RunningSummary
+from process_events import iter_records
+from usage import UsageNormalizer
+from by_type import HEADERS as SUMMARY_HEADERS, format_summary_row, visualize as visualize_by_type
+from all_events import visualize as visualize_all_events
+from event_action_obs import visualize as visualize_event_action_obs
+from input_cost import visualize as visualize_input_cost
+from completion_cost import visualize as visualize_completion_cost
+from viz_charts import create_figures, load_pyplot
+
+# Where the event ids in the served reports link to: the event's JSON, read through its byte-offset index
+EVENT_LINKS = "/event/{id}"
+
+# Reports served under /report/<name>: (title, function writing the page into a stream).
+# The long tables use the virtual-scrolling layout.
+REPORTS = {
+    "by_type": ("Summary by Type", lambda analysis, stream: visualize_by_type(analysis, stream=stream)),
+    "event_action_obs": ("Events by Cost", lambda analysis, stream: visualize_event_action_obs(
+        analysis, layout="virtual", stream=stream, event_links=EVENT_LINKS)),
+    "input_cost": ("Input Cost", lambda analysis, stream: visualize_input_cost(analysis, stream=stream)),
+    "completion_cost": ("Completion Cost", lambda analysis, stream: visualize_completion_cost(
+        analysis, stream=stream)),
+    "all_events": ("All Events", lambda analysis, stream: visualize_all_events(
+        analysis, layout="virtual", stream=stream, event_links=EVENT_LINKS)),
+}
+
+# Charts served as SVG under /chart/<name>.svg, as drawn by viz_charts
+CHARTS = ("usage", "distribution", "cost_by_type")
+
+# Seconds between SSE keep-alive comments when nothing changes
+KEEPALIVE_SECONDS = 15
+
+class LiveAnalysis:
+    """One in-memory analysis of a trajectory that grows while it is served.
+
+    A background thread polls the file with a TrajectoryTail. New events
+    update the running per-type summary right away; the full analysis used
+    by the table reports is rebuilt from the events only when a report is
+    requested after a change. Waiters on `changed` are woken on every update.
+    """
+
+    def __init__(self, file_path, interval=1.0):
+        self.file_path = file_path
+        self.interval = interval
+        self.tail = TrajectoryTail(file_path)
+        self.records = []
+        self.normalizer = UsageNormalizer()
+        self.summary = RunningSummary()
+        self.version = 0
+        self.changed = threading.Condition()
+        self._analysis = None
+        self._analysis_version = -1
+        self._charts = {}
+        self._charts_version = -1
+        self._charts_lock = threading.Lock()  # pyplot is not thread-safe
+        self._event_index = None
+        self._event_index_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        """Read new events; return True if anything changed."""
+        events, restarted = self.tail.poll()
+        if not events and not restarted:
+            return False
+        if restarted:
+            self.normalizer = UsageNormalizer()
+        records = list(iter_records(events, self.normalizer))
+        with self.changed:
+            if restarted:
+                self.records = []
+                self.summary = RunningSummary()
+            self.records.extend(records)
+            self.summary.add_events(records)
+            self.version += 1
+            self.changed.notify_all()
+        return True
+
+    def start(self):
+        self.poll()
+        self._thread = threading.Thread(target=self._poll_periodically, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _poll_periodically(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except OSError as e:
+                print(f"Error reading {self.file_path}: {e}")
+
+    def analysis(self):
+        """A TrajectoryAnalysis of the events read so far, shared until the next change."""
+        with self.changed:
+            if self._analysis_version != self.version:
+                self._analysis = TrajectoryAnalysis(list(self.records))
+                self._analysis_version = self.version
+            return self._analysis
+
+    def chart(self, name):
+        """SVG bytes of one chart of the events read so far, drawn once per change."""
+        with self._charts_lock:
+            version = self.version
+            if self._charts_version != version:
+                analysis = self.analysis()
+                plt = load_pyplot(headless=True)
+                charts = {}
+                for chart_name, fig in create_figures(analysis, plt=plt).items():
+                    svg = io.BytesIO()
+                    fig.savefig(svg, format="svg")
+                    plt.close(fig)
+                    charts[chart_name] = svg.getvalue()
+                self._charts, self._charts_version = charts, version
+            return self._charts[name]
+
+    def event_json(self, event_id):
+        """The JSON text of one event as bytes, or None if there is no such event.
+
+        Read through the sidecar byte-offset index of the file, which is
+        rebuilt when the file changed since the last lookup.
+        """
+        with self._event_index_lock:
+            if self._event_index is None or self._event_index.is_stale():
+                if self._event_index is not None:
+                    self._event_index.close()
+                self._event_index = open_event_index(self.file_path, allow_partial=True)
+            try:
+                return self._event_index.raw(event_id)
+            except KeyError:
+                return None
+
+    def snapshot(self):
+        """The live summary as a JSON-friendly dict."""
+        with self.changed:
+            return {
+                "version": self.version,
+                "status": self.summary.status(),
+                "total_cost": self.summary.total_cost,
+                "headers": SUMMARY_HEADERS,
+                "rows": [[str(cell) for cell in format_summary_row(row)]
+                         for row in self.summary.summary_rows()],
+            }
+
+    def wait_for_change(self, version, timeout):
+        """Block until the version differs from `version` or the timeout passes."""
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+DASHBOARD_SCRIPT = """
+(function () {
+    const status = document.getElementById("status");
+    const head = document.getElementById("head");
+    const body = document.getElementById("body");
+
+    function cell(tag, text) {
+        const element = document.createElement(tag);
+        element.textContent = text;
+        return element;
+    }
+
+    function render(snapshot) {
+        status.textContent = snapshot.status + " (updated " + new Date().toLocaleTimeString() + ")";
+        head.replaceChildren(...snapshot.headers.map(header => cell("th", header)));
+        body.replaceChildren(...snapshot.rows.map(row => {
+            const tr = document.createElement("tr");
+            tr.replaceChildren(...row.map(value => cell("td", value)));
+            return tr;
+        }));
+    }
+
+    const source = new EventSource("/events");
+    source.onmessage = event => render(JSON.parse(event.data));
+    source.onerror = () => { status.textContent += " (disconnected, retrying)"; };
+})();
+"""
+
+def dashboard_page(file_path):
+    links = " | ".join(f'<a href="/report/{name}">{escape(title)}</a>' for name, (title, _) in REPORTS.items())
+    charts = " | ".join(f'<a href="/chart/{name}.svg">{name}</a>' for name in CHARTS)
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Live Cost Dashboard</title>
+    <style>
+        table {{ width: 100%; border-collapse: collapse; }}
+        th, td {{ border: 1px solid black; padding: 8px; text-align: left; }}
+        th {{ background-color: #f2f2f2; }}
+    </style>
+</head>
+<body>
+    <h1>Live Cost Dashboard</h1>
+    <p>{escape(file_path)}</p>
+    <p>Reports: {links}</p>
+    <p>Charts: {charts}</p>
+    <p id="status">Connecting...</p>
+    <table>
+        <thead><tr id="head"></tr></thead>
+        <tbody id="body"></tbody>
+    </table>
+    <script>{DASHBOARD_SCRIPT}</script>
+</body>
+</html>
+"""
+
+class DashboardHandler(BaseHTTPRequestHandler):
+    """Serve the dashboard, the reports, single events, a JSON summary and the SSE update stream."""
+
+    live = None  # The LiveAnalysis, set on the subclass made by make_server
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/":
+            self._send_text(dashboard_page(self.live.file_path), "text/html")
+        elif path == "/api/summary":
+            self._send_text(json.dumps(self.live.snapshot()), "application/json")
+        elif path == "/events":
+            self._send_events()
+        elif path.startswith("/report/") and path[len("/report/"):] in REPORTS:
+            self._send_report(path[len("/report/"):])
+        elif path.startswith("/event/") and path[len("/event/"):].lstrip("-").isdigit():
+            self._send_event(int(path[len("/event/"):]))
+        elif path.startswith("/chart/") and path[len("/chart/"):].removesuffix(".svg") in CHARTS:
+            self._send_bytes(self.live.chart(path[len("/chart/"):].removesuffix(".svg")), "image/svg+xml")
+        else:
+            self.send_error(404)
+
+    def _send_text(self, text, content_type):
+        self._send_bytes(text.encode("utf-8"), f"{content_type}; charset=utf-8")
+
+    def _send_bytes(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_event(self, event_id):
+        body = self.live.event_json(event_id)
+        if body is None:
+            self.send_error(404, f"No event with id {event_id}")
+        else:
+            self._send_bytes(body, "application/json; charset=utf-8")
+
+    def _send_report(self, name):
+        _, write_report = REPORTS[name]
+        analysis = self.live.analysis()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        # Rows are streamed to the client as they are written
+        stream = io.TextIOWrapper(self.wfile, encoding="utf-8", write_through=False)
+        try:
+            write_report(analysis, stream)
+            stream.flush()
+        finally:
+            stream.detach()
+        self.close_connection = True
+
+    def _send_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        version = None
+        try:
+            while True:
+                if version != self.live.version:
+                    snapshot = self.live.snapshot()
+                    version = snapshot["version"]
+                    self.wfile.write(f"data: {json.dumps(snapshot)}\n\n".encode("utf-8"))
+                else:
+                    self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+                self.live.wait_for_change(version, KEEPALIVE_SECONDS)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The browser went away
+
+    def log_message(self, format, *args):
+        pass  # Keep the console for the update lines
+
+def make_server(live, host="127.0.0.1", port=8000):
+    """Return a ThreadingHTTPServer serving `live`; call serve_forever() on it."""
+    handler = type("Handler", (DashboardHandler,), {"live": live})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a live cost dashboard for a (growing) trajectory.")
+    parser.add_argument("file", help="Trajectory file (JSON array or JSON Lines)")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on (default: 8000)")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="Seconds between checks for new events (default: 1)")
+    parser.add_argument("--no-browser", action="store_true", help="Don't open the dashboard in a browser")
+    args = parser.parse_args()
+
+    live = LiveAnalysis(args.file, args.interval)
+    live.start()
+    server = make_server(live, args.host, args.port)
+    url = f"http://{args.host}:{server.server_address[1]}/"
+    print(f"Serving {args.file} at {url} ({live.summary.status()})")
+    if not args.no_browser:
+        webbrowser.open(url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        live.stop()
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
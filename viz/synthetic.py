@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+# Model of the agent's calls, and of the condenser's
+AGENT_MODEL = "anthropic/claude-3-7-sonnet-20250219"
+CONDENSER_MODEL = "anthropic/claude-3-5-haiku-20241022"
+
+# Tools the agent calls: (action, function name, observation)
+TOOLS = [
+    ("run", "execute_bash", "run"),
+    ("read", "str_replace_editor", "read"),
+    ("edit", "str_replace_editor", "edit"),
+    ("browse", "browser", "browse"),
+    ("run_ipython", "execute_ipython_cell", "run_ipython"),
+    ("think", "think", "think"),
+]
+
+# Words of the generated user messages
+WORDS = ("fix", "the", "failing", "test", "in", "parser", "add", "a", "flag", "for", "output", "format",
+         "refactor", "module", "update", "docs", "handle", "empty", "input", "cache", "results", "speed", "up")
+
+# Condense the history once the prompt grows past this many tokens
+CONDENSE_AT_TOKENS = 120_000
+
+class TrajectoryGenerator:
+    """Generate a realistic trajectory, event by event, from a seed.
+
+    The agent works in steps: a model response with one or more tool calls,
+    each an action followed by its observation. Both carry the response in
+    tool_call_metadata.model_response, and the action also carries the
+    agent's running totals in llm_metrics.accumulated_token_usage. The
+    prompt grows with every observation and is mostly read from the cache;
+    once it is long the history is condensed by a second model. User
+    messages, agent_state_changed observations and long pauses (so that
+    the prompt cache expires) are mixed in. The same seed always gives the
+    same events.
+    """
+
+    def __init__(self, seed=0, start=datetime(2025, 4, 2, 15, 0, 0)):
+        self.rng = random.Random(seed)
+        self.time = start
+        self.next_id = 0
+        self.prompt_tokens = 0
+        self.totals = {}  # model -> running token totals
+        self.accumulated_cost = 0.0
+
+    def events(self, count):
+        """Yield `count` events."""
+        emitted = 0
+        for event in self._session():
+            if emitted == count:
+                return
+            yield event
+            emitted += 1
+
+    def _event(self, source, seconds, **fields):
+        self.time += timedelta(seconds=seconds)
+        event = {"id": self.next_id, "timestamp": self.time.isoformat(), "source": source}
+        event.update(fields)
+        self.next_id += 1
+        return event
+
+    def _state_changed(self, state):
+        return self._event("environment", 0.01, message="", observation="agent_state_changed",
+                           content="", extras={"agent_state": state, "reason": ""})
+
+    def _session(self):
+        rng = self.rng
+        yield self._state_changed("loading")
+        while True:
+            # A user task, then agent steps until it finishes
+            message = f"Task {self.next_id}: " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 30)))
+            yield self._event("user", rng.uniform(5, 60), message=message, action="message",
+                              args={"content": message, "image_urls": [], "wait_for_response": False})
+            yield self._state_changed("running")
+            recall = self._event("user", 0.01, message=f"Retrieving content for: {message[:40]}", action="recall",
+                                 args={"recall_type": "workspace_context", "query": message, "thought": ""})
+            yield recall
+            yield self._event("environment", 0.01, message="Added workspace context", observation="recall",
+                              cause=recall["id"], content="")
+            self.prompt_tokens += 3000 + len(message)
+
+            for _ in range(rng.randint(5, 60)):
+                if self.prompt_tokens > CONDENSE_AT_TOKENS:
+                    yield self._condensation()
+                yield from self._step()
+            yield from self._finish()
+            yield self._state_changed("awaiting_user_input")
+            if rng.random() < 0.2:
+                # The user comes back after the prompt cache expired
+                self.time += timedelta(minutes=rng.uniform(6, 30))
+
+    def _usage(self, completion_tokens, new_tokens):
+        """A model response's usage for a call that adds `new_tokens` to the cached prompt."""
+        cache_read = self.prompt_tokens
+        self.prompt_tokens += new_tokens
+        return {
+            "completion_tokens": completion_tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "total_tokens": self.prompt_tokens + completion_tokens,
+            "completion_tokens_details": None,
+            "prompt_tokens_details": {"audio_tokens": None, "cached_tokens": cache_read},
+            "cache_creation_input_tokens": new_tokens,
+            "cache_read_input_tokens": cache_read,
+        }
+
+    def _llm_metrics(self, model, usage):
+        totals = self.totals.setdefault(model, dict.fromkeys(
+            ("prompt_tokens", "completion_tokens", "cache_read_tokens", "cache_write_tokens"), 0))
+        totals["prompt_tokens"] += usage["prompt_tokens"]
+        totals["completion_tokens"] += usage["completion_tokens"]
+        totals["cache_read_tokens"] += usage["cache_read_input_tokens"]
+        totals["cache_write_tokens"] += usage["cache_creation_input_tokens"]
+        self.accumulated_cost += (usage["completion_tokens"] * 15 + usage["cache_creation_input_tokens"] * 3.75
+                                  + usage["cache_read_input_tokens"] * 0.3) / 1e6
+        return {
+            "accumulated_cost": round(self.accumulated_cost, 8),
+            "accumulated_token_usage": dict(totals, model=model, response_id=""),
+            "costs": [],
+            "response_latencies": [],
+            "token_usages": [],
+        }
+
+    def _model_response(self, usage):
+        rng = self.rng
+        return {
+            "id": f"chatcmpl-{rng.getrandbits(128):032x}",
+            "created": int(self.time.timestamp()),
+            "model": AGENT_MODEL.split("/")[-1],
+            "object": "chat.completion",
+            "system_fingerprint": None,
+            "choices": [{"finish_reason": "tool_calls", "index": 0,
+                         "message": {"content": "", "role": "assistant"}}],
+            "usage": usage,
+        }
+
+    def _step(self):
+        """One model response, and the action and observation of each of its tool calls."""
+        rng = self.rng
+        calls = rng.choices((1, 2, 3), weights=(85, 12, 3))[0]
+        usage = self._usage(rng.randint(40, 900), rng.randint(50, 1500))
+        response = self._model_response(usage)
+        metrics = self._llm_metrics(AGENT_MODEL, usage)
+        thinking = rng.lognormvariate(1.0, 0.8)  # Seconds until the response arrives
+        for call in range(calls):
+            action, function, observation = rng.choice(TOOLS)
+            metadata = {"function_name": function, "tool_call_id": f"toolu_{rng.getrandbits(96):024x}",
+                        "model_response": response, "total_calls_in_response": calls}
+            path = f"/workspace/src/module_{rng.randint(0, 200)}.py"
+            args = {"path": path} if action in ("read", "edit") else {"command": f"pytest -q tests/test_{rng.randint(0, 50)}.py"}
+            action_event = self._event("agent", thinking if call == 0 else 0.01, message="", action=action,
+                                       tool_call_metadata=metadata, args=args)
+            if call == 0:
+                action_event["llm_metrics"] = metrics
+            yield action_event
+            output = rng.randint(20, 4000)
+            yield self._event("agent", rng.lognormvariate(-1.0, 1.2),
+                              message=f"{observation} output ({output} characters)", cause=action_event["id"],
+                              observation=observation, tool_call_metadata=metadata, content="x" * min(output, 200))
+            self.prompt_tokens += output // 4
+
+    def _condensation(self):
+        """The condenser summarizes the history with its own model, shrinking the prompt."""
+        rng = self.rng
+        forgotten = self.prompt_tokens * 3 // 4
+        condenser_usage = {
+            "completion_tokens": rng.randint(500, 2000),
+            "prompt_tokens": self.prompt_tokens,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+        }
+        self.prompt_tokens -= forgotten
+        metrics = self._llm_metrics(CONDENSER_MODEL, condenser_usage)
+        return self._event("agent", rng.uniform(2, 10), message="Summary of the forgotten events", action="condensation",
+                           llm_metrics=metrics, args={"forgotten_events_start_id": 0,
+                                                      "forgotten_events_end_id": self.next_id - 1})
+
+    def _finish(self):
+        usage = self._usage(self.rng.randint(50, 300), self.rng.randint(50, 500))
+        response = self._model_response(usage)
+        metadata = {"function_name": "finish", "tool_call_id": f"toolu_{self.rng.getrandbits(96):024x}",
+                    "model_response": response, "total_calls_in_response": 1}
+        yield self._event("agent", self.rng.lognormvariate(1.0, 0.8), message="All done!", action="finish",
+                          tool_call_metadata=metadata, llm_metrics=self._llm_metrics(AGENT_MODEL, usage),
+                          args={"outputs": {}, "thought": ""})
+
+def write_trajectory(file_path, count, seed=0):
+    """Write a generated trajectory of `count` events; .jsonl gets one event per line, else a JSON array."""
+    events = TrajectoryGenerator(seed).events(count)
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        if file_path.endswith(".jsonl"):
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+        else:
+            f.write("[\n")
+            for i, event in enumerate(events):
+                f.write(("" if i == 0 else ",\n") + json.dumps(event))
+            f.write("\n]\n")
+    os.replace(tmp_path, file_path)
+    return file_path
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate seeded synthetic trajectories for benchmarks.")
+    parser.add_argument("output", help="File to write (.json for a JSON array, .jsonl for JSON Lines)")
+    parser.add_argument("--events", type=int, default=10_000, help="Number of events (default: 10000)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    args = parser.parse_args()
+    write_trajectory(args.output, args.events, args.seed)
+    print(f"Wrote {args.events} events to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from common import COST_PER_CACHE_WRITE_TOKEN, COST_PER_CACHE_READ_TOKEN, COST_PER_COMPLETION_TOKEN
+from event_stream import iter_events
+from event_table import EventTable, build_event_table
+
+# Where processed event tables are cached, and how large the cache may grow
+CACHE_DIR = os.environ.get("VIZ_CACHE_DIR", ".viz_cache")
+CACHE_MAX_BYTES = int(os.environ.get("VIZ_CACHE_MAX_BYTES", 1 << 30))
+
+# Bump when the layout of a cache entry or the processing in process_events changes
+CACHE_FORMAT_VERSION = 2
+
+# Remembers the content hash of each file by (size, mtime) so warm runs don't re-read it
+HASH_INDEX_FILE = "hashes.json"
+
+def file_digest(file_path):
+    """Return the SHA-256 of a file's content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _read_hash_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, HASH_INDEX_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_json_atomic(path, content):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(content, f)
+    os.replace(tmp_path, path)
+
+def cache_key(file_path, cache_dir=CACHE_DIR, attribution="window"):
+    """Key a trajectory by its content hash, mtime, the cost attribution and the cost constants in common.py."""
+    stat = os.stat(file_path)
+    abs_path = os.path.abspath(file_path)
+
+    hash_index = _read_hash_index(cache_dir)
+    known = hash_index.get(abs_path)
+    if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+        digest = known["digest"]
+    else:
+        digest = file_digest(file_path)
+        hash_index[abs_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "digest": digest}
+        _write_json_atomic(os.path.join(cache_dir, HASH_INDEX_FILE), hash_index)
+
+    key_material = json.dumps([
+        CACHE_FORMAT_VERSION, digest, stat.st_mtime_ns, attribution,
+        COST_PER_COMPLETION_TOKEN, COST_PER_CACHE_WRITE_TOKEN, COST_PER_CACHE_READ_TOKEN,
+    ])
+    return hashlib.sha256(key_material.encode("utf-8")).hexdigest()[:32]
+
+def save_event_table(table, entry_dir):
+    """Write a table as one .npy file per column plus a JSON file of metadata."""
+    parent = os.path.dirname(entry_dir)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+    try:
+        for name, column in table.columns.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), column, allow_pickle=False)
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"columns": list(table.columns), "subt_categories": table.subt_categories}, f)
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        # Another process may have stored the same entry first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.isdir(entry_dir):
+            raise
+
+def load_cached_table(entry_dir):
+    """Load a cached table with every column memory-mapped."""
+    with open(os.path.join(entry_dir, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    columns = {name: np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+               for name in meta["columns"]}
+    return EventTable(columns, meta["subt_categories"])
+
+def _entry_size(entry_dir):
+    return sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+
+def evict(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, keep=None):
+    """Remove the least recently used entries until the cache fits in `max_bytes`."""
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_dir() and not entry.name.startswith("."):
+            entries.append((entry.stat().st_mtime_ns, entry.path, _entry_size(entry.path)))
+
+    total = sum(size for _, _, size in entries)
+    for _, path, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+def load_event_table(file_path, build=None, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES,
+                     attribution="window"):
+    """Return the processed event table of a trajectory file, using the on-disk cache.
+
+    On a hit the table is memory-mapped from the cache. On a miss it is built
+    with `build()` (by default by streaming the file), stored, and the least
+    recently used entries are evicted to keep the cache under `max_bytes`.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    entry_dir = os.path.join(cache_dir, cache_key(file_path, cache_dir, attribution))
+
+    if os.path.isdir(entry_dir):
+        try:
+            table = load_cached_table(entry_dir)
+            os.utime(entry_dir)  # Mark as recently used
+            return table
+        except (OSError, ValueError, KeyError):
+            # A damaged entry is rebuilt below
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+    table = build() if build is not None else build_event_table(iter_events(file_path), attribution)
+    save_event_table(table, entry_dir)
+    evict(cache_dir, max_bytes, keep=entry_dir)
+    return table
@@ -0,0 +1,23 @@
+from process_events import process_events
+from synthetic import TrajectoryGenerator
+
+def without_timestamps(events, start=0):
+    """The events with the timestamps of those from `start` on removed."""
+    return [{key: value for key, value in event.items() if key != "timestamp" or i < start}
+            for i, event in enumerate(events)]
+
+def test_exact_attribution_without_timestamps():
+    events = list(TrajectoryGenerator(seed=1).events(300))
+    rows = process_events(without_timestamps(events), "exact")
+    timed_rows = process_events(events, "exact")
+
+    assert rows
+    # Without timestamps only the outdated-cache check is skipped
+    assert [row["event_cost"] for row in rows] == [row["event_cost"] for row in timed_rows]
+    assert all(row["special"] == "" for row in rows)
+
+def test_exact_attribution_after_timestamps_stop():
+    events = list(TrajectoryGenerator(seed=2).events(300))
+    rows = process_events(without_timestamps(events, start=150), "exact")
+
+    assert [row["event_cost"] for row in rows] == [row["event_cost"] for row in process_events(events, "exact")]
@@ -0,0 +1,15 @@
+from process_events import iter_records
+from synthetic import TrajectoryGenerator
+from usage import RECENT_RESPONSES, UsageNormalizer, UsageSeries
+
+def test_normalizer_remembers_only_recent_responses():
+    events = list(TrajectoryGenerator(seed=4).events(2000))
+    normalizer = UsageNormalizer()
+    series = UsageSeries(iter_records(events, normalizer))
+
+    assert len(normalizer.responses) <= RECENT_RESPONSES
+    # Every response is still counted once, on its first event
+    response_ids = {event["tool_call_metadata"]["model_response"]["id"]
+                    for event in events if "tool_call_metadata" in event}
+    assert len({record.response_id for record in series.records if record.response_id}) == len(response_ids)
+    assert sum(1 for record in series.records if record.response_id) == len(response_ids)
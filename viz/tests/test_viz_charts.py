@@ -0,0 +1,37 @@
+import pytest
+from viz_charts import bucket_starts, create_figures, load_pyplot
+from synthetic import TrajectoryGenerator
+
+@pytest.fixture
+def plt():
+    return load_pyplot(headless=True)
+
+def events_without_llm_calls():
+    """The user messages and state changes of a generated trajectory, without any model response."""
+    return [event for event in TrajectoryGenerator(seed=3).events(200)
+            if "llm_metrics" not in event and "tool_call_metadata" not in event]
+
+@pytest.mark.parametrize("events", [[], events_without_llm_calls()], ids=["empty", "no_llm_calls"])
+def test_charts_without_llm_calls(plt, events, tmp_path):
+    figures = create_figures(events, plt=plt)
+
+    assert set(figures) == {"usage", "distribution", "cost_by_type"}
+    for name, fig in figures.items():
+        fig.savefig(tmp_path / f"{name}.svg")
+        plt.close(fig)
+
+def test_charts_from_a_stream(plt):
+    events = list(TrajectoryGenerator(seed=5).events(300))
+    from_list = create_figures(events, plt=plt)
+    from_stream = create_figures(iter(events), plt=plt)
+
+    # The cost-by-type pie needs a second look at the events, which a stream can't give
+    pies = [figures["cost_by_type"].axes[0].patches for figures in (from_list, from_stream)]
+    assert len(pies[1]) == len(pies[0]) > 0
+    for figures in (from_list, from_stream):
+        for fig in figures.values():
+            plt.close(fig)
+
+def test_bucket_starts_needs_a_bar():
+    with pytest.raises(ValueError):
+        bucket_starts(10, 0)
@@ -0,0 +1,126 @@
+from collections import OrderedDict
+import numpy as np
+from common import COST_PER_CACHE_WRITE_TOKEN, COST_PER_CACHE_READ_TOKEN, COST_PER_COMPLETION_TOKEN
+
+# Fields of a normalized per-call usage dict
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "cache_read_tokens", "cache_write_tokens")
+
+# The same counts in a model response's usage (tool_call_metadata.model_response.usage)
+RESPONSE_KEYS = ("prompt_tokens", "completion_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+
+# The same counts in the agent's running totals (llm_metrics.accumulated_token_usage)
+ACCUMULATED_KEYS = USAGE_FIELDS
+
+# Responses remembered to recognize their other events; a response's action and
+# observation(s) are a few events apart, so recent ones are enough
+RECENT_RESPONSES = 64
+
+# Cost of one token of each field in USD; prompt tokens are already counted as cache reads and writes
+FIELD_COSTS = {
+    "prompt_tokens": 0.0,
+    "completion_tokens": COST_PER_COMPLETION_TOKEN,
+    "cache_read_tokens": COST_PER_CACHE_READ_TOKEN,
+    "cache_write_tokens": COST_PER_CACHE_WRITE_TOKEN,
+}
+
+class UsageNormalizer:
+    """Work out the per-call LLM usage of event records, one batch at a time.
+
+    An event carries usage in one of two ways. Events produced by a model
+    response carry that response's own usage; the action and its
+    observation(s) share it, so a response is counted once, on the first
+    event that reports it. Other events may only carry the agent's
+    accumulated usage, a running total per model; their per-call usage is
+    the difference from the previous total of the same model. Condensation
+    events report the condenser's metrics, which is why totals are
+    differenced per model, and a counter that goes down (metrics restarted
+    after a condensation or a resumed session) starts a new running total.
+
+    Sets on every record:
+    - `llm_usage`: the usage of the call the event belongs to, or {}
+    - `call_usage`: the same, but only on the event that first reports the call
+
+    Both are dicts with USAGE_FIELDS. The previous totals and the last
+    RECENT_RESPONSES responses are kept between batches, so a trajectory can
+    be normalized as it is read in constant memory.
+    """
+
+    def __init__(self):
+        self.last_totals = {}  # model -> totals of its last accumulated usage
+        self.responses = OrderedDict()  # response id -> its normalized usage, least recently seen first
+
+    def normalize(self, records):
+        """Set the usage of a batch of records, in trajectory order, and return them."""
+        # Every running total moves the series on, but only events without a
+        # response of their own take their usage from it
+        accumulated = [i for i, record in enumerate(records) if record.accumulated_usage]
+        deltas = self._accumulated_deltas([records[i].accumulated_usage for i in accumulated])
+        delta_of = dict(zip(accumulated, deltas.tolist()))
+
+        responses = self.responses
+        for i, record in enumerate(records):
+            if record.usage:
+                usage = responses.get(record.response_id) if record.response_id else None
+                if usage is None:
+                    usage = dict(zip(USAGE_FIELDS, (record.usage.get(key) or 0 for key in RESPONSE_KEYS)))
+                    if record.response_id:
+                        responses[record.response_id] = usage
+                        if len(responses) > RECENT_RESPONSES:
+                            responses.popitem(last=False)
+                    record.call_usage = usage
+                else:
+                    responses.move_to_end(record.response_id)
+                    record.call_usage = {}
+                record.llm_usage = usage
+            elif i in delta_of and any(delta_of[i]):
+                record.llm_usage = record.call_usage = dict(zip(USAGE_FIELDS, delta_of[i]))
+            else:
+                # No usage, or running totals that didn't move: no new call
+                record.llm_usage = record.call_usage = {}
+        return records
+
+    def _accumulated_deltas(self, usages):
+        """Per-call usage from running totals: one diff per model over the batch."""
+        totals = np.array([[usage.get(key) or 0 for key in ACCUMULATED_KEYS] for usage in usages],
+                          dtype=np.int64).reshape(-1, len(ACCUMULATED_KEYS))
+        models = np.array([str(usage.get("model", "")) for usage in usages], dtype=object)
+        deltas = np.empty_like(totals)
+        for model in dict.fromkeys(models.tolist()):
+            rows = np.flatnonzero(models == model)
+            series = totals[rows]
+            previous = np.vstack([self.last_totals.get(model, np.zeros(len(ACCUMULATED_KEYS), dtype=np.int64)),
+                                  series[:-1]])
+            model_deltas = series - previous
+            reset = (model_deltas < 0).any(axis=1)
+            model_deltas[reset] = series[reset]
+            deltas[rows] = model_deltas
+            self.last_totals[model] = series[-1]
+        return deltas
+
+class UsageSeries:
+    """The per-call usage of a trajectory, one row per LLM call, in trajectory order.
+
+    `records` are the events that first report each call; token columns
+    are int64 arrays named after USAGE_FIELDS.
+    """
+
+    def __init__(self, records):
+        self.records = [record for record in records if record.call_usage]
+        self.columns = {
+            name: np.array([record.call_usage[name] for record in self.records], dtype=np.int64)
+            for name in USAGE_FIELDS
+        }
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @property
+    def ids(self):
+        return [record.id for record in self.records]
+
+    def cost(self, name):
+        """The cost in USD of one token column, per call."""
+        return self.columns[name] * FIELD_COSTS[name]
@@ -1,65 +1,146 @@
+import argparse
+import os
 import numpy as np
-import matplotlib.pyplot as plt
-from common import select_and_load_json, COST_PER_COMPLETION_TOKEN, COST_PER_CACHE_WRITE_TOKEN, COST_PER_CACHE_READ_TOKEN
-from by_type import create_summary_rows
-from process_events import process_events
-
-def visualize(data=None):
-    
-    # Extract events that include LLM metrics (accumulated_token_usage)
-    llm_events = []
-    for event in data:
-        llm_metrics = event.get("llm_metrics")
-        if llm_metrics and "accumulated_token_usage" in llm_metrics:
-            usage = llm_metrics["accumulated_token_usage"]
-            llm_events.append({
-                "id": event["id"],
-                "completion_tokens": usage.get("completion_tokens", 0),
-                "cache_write_tokens": usage.get("cache_write_tokens", 0),
-                "cache_read_tokens": usage.get("cache_read_tokens", 0),
-            })
-
-    # Sort events by ID for chronological order
-    llm_events.sort(key=lambda x: x["id"])
+from common import select_and_load_json, has_display, COST_PER_COMPLETION_TOKEN, COST_PER_CACHE_WRITE_TOKEN, COST_PER_CACHE_READ_TOKEN
+from analysis import TrajectoryAnalysis
+from profiling import stage
+
+# Image formats the charts can be written as in headless mode
+CHART_FORMATS = ("png", "svg")
+
+# Most events drawn as one bar each; longer series are grouped into this many buckets of consecutive events
+MAX_BARS = 300
+
+# Most labeled ticks on the event axis
+MAX_TICK_LABELS = 20
+
+def load_pyplot(headless):
+    """Import pyplot, with the non-interactive Agg backend when headless.
+
+    Importing pyplot is slow and picks an interactive backend by default,
+    so it is only imported once charts are drawn.
+    """
+    import matplotlib
+    if headless:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+def bucket_starts(count, max_bars=MAX_BARS):
+    """Start index of each bucket when `count` events are drawn as at most `max_bars` bars."""
+    if max_bars < 1:
+        raise ValueError(f"max_bars must be at least 1, got {max_bars}")
+    if count <= max_bars:
+        return np.arange(count)
+    return np.unique(np.linspace(0, count, max_bars, endpoint=False).astype(np.intp))
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+def bucket_stats(values, starts):
+    """Per-bucket (sums, minimums, maximums) of `values`, for buckets beginning at `starts`."""
+    if len(values) == 0:
+        return values, values, values
+    return (np.add.reduceat(values, starts),
+            np.minimum.reduceat(values, starts),
+            np.maximum.reduceat(values, starts))
+
+def stacked_bars(ax, starts, widths, layers, ylabel):
+    """Draw stacked bars of per-event means, with the per-event min-max range of the total when bucketed.
+
+    `layers` is a list of (values per event, color, label). Buckets are
+    drawn as one filled step line per layer rather than a patch per bar.
+    """
+    bucketed = len(starts) and widths.max() > 1
+    edges = np.append(starts, starts[-1] + widths[-1]) if len(starts) else np.zeros(1)
+    bottom = np.zeros(len(starts))
+    total = np.zeros(len(layers[0][0]))
+    for values, color, label in layers:
+        sums, _, _ = bucket_stats(values, starts)
+        means = sums / widths
+        if bucketed:
+            ax.stairs(bottom + means, edges, baseline=bottom.copy(), fill=True, color=color, label=label)
+        else:
+            ax.bar(starts, means, width=0.8, bottom=bottom, align="edge", color=color, label=label)
+        bottom += means
+        total += values
+    if bucketed:
+        _, lows, highs = bucket_stats(total, starts)
+        ax.vlines(starts + widths / 2, lows, highs, colors="black", linewidth=0.5, label="min-max per event")
+    ax.set_ylabel(ylabel)
+    ax.legend(loc="upper left")
+
+def pie_or_placeholder(ax, values, **kwargs):
+    """Draw a pie of `values`, or a "No data" note when they add up to nothing (no LLM calls yet)."""
+    if sum(values) > 0:
+        ax.pie(values, **kwargs)
+    else:
+        ax.text(0.5, 0.5, "No data", ha="center", va="center", transform=ax.transAxes)
+        ax.set_axis_off()
+
+def create_figures(data=None, max_bars=MAX_BARS, plt=None):
+    """Draw the charts and return them as {name: figure}."""
+    if plt is None:
+        plt = load_pyplot(headless=not has_display())
+
+    # Both the usage series and the summary are read from one pass over the data,
+    # which may be a stream
+    analysis = data if isinstance(data, TrajectoryAnalysis) else TrajectoryAnalysis(data)
+
+    # One entry per LLM call, in chronological order
+    series = analysis.usage_series
 
     # Prepare data arrays for plotting
-    ids = [str(evt["id"]) for evt in llm_events]
-    completion_tokens = np.array([evt["completion_tokens"] for evt in llm_events], dtype=float)
-    cache_write_tokens = np.array([evt["cache_write_tokens"] for evt in llm_events], dtype=float)
-    cache_read_tokens = np.array([evt["cache_read_tokens"] for evt in llm_events], dtype=float)
+    ids = [str(event_id) for event_id in series.ids]
+    completion_tokens = series["completion_tokens"].astype(float)
+    cache_write_tokens = series["cache_write_tokens"].astype(float)
+    cache_read_tokens = series["cache_read_tokens"].astype(float)
 
-    x = np.arange(len(ids))
+    # Long series are drawn as buckets of consecutive events
+    starts = bucket_starts(len(ids), max_bars)
+    widths = np.diff(np.append(starts, len(ids))).astype(float)
 
     # Compute cost for each token type (in USD)
     completion_cost = completion_tokens * COST_PER_COMPLETION_TOKEN
     cache_write_cost = cache_write_tokens * COST_PER_CACHE_WRITE_TOKEN
     cache_read_cost = cache_read_tokens * COST_PER_CACHE_READ_TOKEN
 
+    figures = {}
+
     # Create two subplots: one for token counts and one for cost
     fig, (ax_top, ax_bottom) = plt.subplots(nrows=2, ncols=1, figsize=(12, 8), sharex=True)
 
     # ----- Top subplot: Token Usage -----
-    ax_top.bar(x, cache_read_tokens, color='skyblue', label='cache_read_tokens')
-    ax_top.bar(x, cache_write_tokens, bottom=cache_read_tokens, color='orange', label='cache_write_tokens')
-    ax_top.bar(x, completion_tokens, bottom=cache_read_tokens + cache_write_tokens, color='red', label='completion_tokens')
-
-    ax_top.set_ylabel("Tokens")
-    ax_top.set_title("LLM Token Usage (Top) vs Cost in USD (Bottom) by Event")
-    ax_top.legend(loc='upper left')
+    stacked_bars(ax_top, starts, widths, [
+        (cache_read_tokens, 'skyblue', 'cache_read_tokens'),
+        (cache_write_tokens, 'orange', 'cache_write_tokens'),
+        (completion_tokens, 'red', 'completion_tokens'),
+    ], "Tokens")
+    title = "LLM Token Usage (Top) vs Cost in USD (Bottom) by Event"
+    if len(starts) < len(ids):
+        title += f"\nMean per event in {len(starts)} buckets of ~{len(ids) / len(starts):.0f} events"
+    ax_top.set_title(title)
 
     # ----- Bottom subplot: Cost -----
-    ax_bottom.bar(x, cache_read_cost, color='skyblue', label='cache_read_cost')
-    ax_bottom.bar(x, cache_write_cost, bottom=cache_read_cost, color='orange', label='cache_write_cost')
-    ax_bottom.bar(x, completion_cost, bottom=cache_read_cost + cache_write_cost, color='red', label='completion_cost')
-
-    ax_bottom.set_ylabel("Cost (USD)")
-    ax_bottom.legend(loc='upper left')
+    stacked_bars(ax_bottom, starts, widths, [
+        (cache_read_cost, 'skyblue', 'cache_read_cost'),
+        (cache_write_cost, 'orange', 'cache_write_cost'),
+        (completion_cost, 'red', 'completion_cost'),
+    ], "Cost (USD)")
     ax_bottom.set_xlabel("Event ID")
-    ax_bottom.set_xticks(x)
-    ax_bottom.set_xticklabels(ids, rotation=45)
 
-    plt.tight_layout()
-    plt.show()
+    # Label a few buckets with the ID of their first event
+    labeled = starts[np.unique(np.linspace(0, len(starts), MAX_TICK_LABELS, endpoint=False).astype(np.intp))] \
+        if len(starts) else starts
+    ax_bottom.set_xticks(labeled + 0.4)
+    ax_bottom.set_xticklabels([ids[i] for i in labeled], rotation=45)
+
+    fig.tight_layout()
+    figures["usage"] = fig
 
     # Compute total tokens and costs
     total_completion_tokens = np.sum(completion_tokens)
@@ -76,22 +157,21 @@ def visualize(data=None):
     # ----- Pie chart: Token Distribution -----
     token_labels = ['Completion Tokens', 'Cache Write Tokens', 'Cache Read Tokens']
     token_values = [total_completion_tokens, total_cache_write_tokens, total_cache_read_tokens]
-    ax_pie_tokens.pie(token_values, labels=token_labels, autopct='%1.1f%%', startangle=90, colors=['red', 'orange', 'skyblue'])
+    pie_or_placeholder(ax_pie_tokens, token_values, labels=token_labels, autopct='%1.1f%%', startangle=90, colors=['red', 'orange', 'skyblue'])
     ax_pie_tokens.set_title("Token Distribution")
 
     # ----- Pie chart: Cost Distribution -----
     cost_labels = ['Completion Cost', 'Cache Write Cost', 'Cache Read Cost']
     cost_values = [total_completion_cost, total_cache_write_cost, total_cache_read_cost]
-    ax_pie_costs.pie(cost_values, labels=cost_labels, autopct='%1.1f%%', startangle=90, colors=['red', 'orange', 'skyblue'])
+    pie_or_placeholder(ax_pie_costs, cost_values, labels=cost_labels, autopct='%1.1f%%', startangle=90, colors=['red', 'orange', 'skyblue'])
     ax_pie_costs.set_title("Cost Distribution (USD)")
 
-    plt.tight_layout()
-    plt.show()
+    fig.tight_layout()
+    figures["distribution"] = fig
 
     # ----- Additional Pie Chart: Event Cost by Type -----
     # Create summary rows using the reusable function
-    table_rows = process_events(data)
-    summary_rows = create_summary_rows(table_rows)
+    summary_rows = analysis.summary_rows
 
     # Extract data for the pie chart
     event_types = [row["subt"] for row in summary_rows]
@@ -99,12 +179,47 @@ def visualize(data=None):
 
     # Create the pie chart
     fig, ax_event_cost = plt.subplots(figsize=(8, 6))
-    ax_event_cost.pie(event_costs, labels=event_types, autopct='%1.1f%%', startangle=90)
+    pie_or_placeholder(ax_event_cost, event_costs, labels=event_types, autopct='%1.1f%%', startangle=90)
     ax_event_cost.set_title("Event Cost Distribution by Type (USD). Excludes cache-read cost")
 
-    plt.tight_layout()
-    plt.show()
-
+    fig.tight_layout()
+    figures["cost_by_type"] = fig
+    return figures
+
+def visualize(data=None, image_format=None, max_bars=MAX_BARS, prefix="charts"):
+    """Draw the charts, and either show them or write them to output/.
+
+    With an `image_format` ("png" or "svg"), or when there is no display,
+    the charts are written to output/<prefix>_<name>.<format> without
+    opening any windows, and the paths are returned. Otherwise they are
+    shown in one interactive session.
+    """
+    headless = image_format is not None or not has_display()
+    with stage("charts: import pyplot"):
+        plt = load_pyplot(headless)
+    with stage("charts: draw"):
+        figures = create_figures(data, max_bars, plt)
+    if not headless:
+        plt.show()
+        return []
+
+    output_dir = "output"
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for name, fig in figures.items():
+        path = os.path.join(output_dir, f"{prefix}_{name}.{image_format or 'png'}")
+        with stage("charts: save"):
+            fig.savefig(path)
+        plt.close(fig)
+        paths.append(path)
+    return paths
 
 if __name__ == "__main__":
-    visualize(data = select_and_load_json())
+    parser = argparse.ArgumentParser(description="Draw the token usage and cost charts of a trajectory.")
+    parser.add_argument("--format", choices=CHART_FORMATS,
+                        help="Write the charts to output/ in this format instead of showing them")
+    parser.add_argument("--max-bars", type=positive_int, default=MAX_BARS,
+                        help=f"Most bars per chart before events are bucketed (default: {MAX_BARS})")
+    args = parser.parse_args()
+    for path in visualize(data = select_and_load_json(), image_format=args.format, max_bars=args.max_bars):
+        print(f"Chart saved to {path}")